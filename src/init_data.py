@@ -1,22 +1,132 @@
 """
 Script para inicializar dados padrão no sistema
 """
+from sqlalchemy import inspect, text
 from src.models.user import db, User, Setting
 
+def migrate_schema():
+    """Cria tabelas, colunas e índices que ainda não existem no banco
+
+    O SQLite só permite adicionar colunas que aceitam NULL, por isso novas
+    colunas dos modelos devem ser declaradas como nullable.
+    """
+    # Journal WAL: leituras (dashboard) não bloqueiam os commits
+    from src.services.analytics_db import enable_wal
+    enable_wal()
+
+    inspector = inspect(db.engine)
+    had_user_stats = inspector.has_table('user_stats')
+
+    db.create_all()
+
+    inspector = inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_type = column.type.compile(dialect=db.engine.dialect)
+                    connection.execute(text(
+                        f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'
+                    ))
+                    print(f"✓ Coluna criada: {table.name}.{column.name}")
+
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+    ensure_order_autoincrement()
+
+    # Reposições que apontavam para pedidos arquivados antes de refill_archive
+    from src.services.archive import archive_orphan_refills
+    moved_refills = archive_orphan_refills()
+    if moved_refills:
+        print(f"✓ {moved_refills} reposições movidas para refill_archive")
+
+    # Tabela virtual FTS5 da busca de serviços (não gerenciada pelo create_all)
+    from src.services.service_search import ensure_search_index, index_services
+    if ensure_search_index():
+        index_services()
+        print("✓ Índice de busca de serviços criado")
+
+    # Contadores por usuário: preenchidos a partir dos pedidos já existentes
+    if not had_user_stats:
+        from src.services.user_stats import rebuild_user_stats
+        rebuild_user_stats()
+        print("✓ Contadores de pedidos por usuário criados")
+    db.session.commit()
+
+    print("✓ Schema atualizado com sucesso!")
+
+def ensure_order_autoincrement():
+    """Garante que ids de pedidos nunca sejam reutilizados
+
+    Sem AUTOINCREMENT o SQLite reutiliza os ids removidos pelo arquivamento,
+    e um pedido novo colidiria com um pedido de order_archive. Bancos criados
+    antes disso têm a tabela order recriada com AUTOINCREMENT; a sequência
+    sempre começa acima do maior id já arquivado.
+    """
+    from sqlalchemy.schema import CreateTable
+    from src.models.user import Order
+
+    if db.engine.dialect.name != 'sqlite':
+        return
+
+    table = Order.__table__
+    with db.engine.begin() as connection:
+        table_sql = connection.execute(text(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'order'"
+        )).scalar() or ''
+
+        if 'AUTOINCREMENT' not in table_sql.upper():
+            columns = ', '.join(f'"{column.name}"' for column in table.columns)
+            create_sql = str(CreateTable(table).compile(dialect=db.engine.dialect))
+            connection.execute(text(create_sql.replace('CREATE TABLE "order"', 'CREATE TABLE order_rebuild', 1)))
+            connection.execute(text(
+                f'INSERT INTO order_rebuild ({columns}) SELECT {columns} FROM "order"'
+            ))
+            connection.execute(text('DROP TABLE "order"'))
+            connection.execute(text('ALTER TABLE order_rebuild RENAME TO "order"'))
+            for index in table.indexes:
+                index.create(connection)
+            print("✓ Tabela order recriada com AUTOINCREMENT")
+
+        # Próximo id acima de todos os pedidos ativos e arquivados
+        high_water = connection.execute(text(
+            'SELECT MAX(id) FROM (SELECT MAX(id) AS id FROM "order" '
+            'UNION ALL SELECT MAX(id) FROM order_archive)'
+        )).scalar() or 0
+        current = connection.execute(text(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'order'"
+        )).scalar()
+        if current is None:
+            connection.execute(text(
+                "INSERT INTO sqlite_sequence (name, seq) VALUES ('order', :seq)"
+            ), {'seq': high_water})
+        elif current < high_water:
+            connection.execute(text(
+                "UPDATE sqlite_sequence SET seq = :seq WHERE name = 'order'"
+            ), {'seq': high_water})
+
 def init_default_data():
     """Inicializa dados padrão do sistema"""
     
+    # Carrega de uma vez os usuários e configurações padrão já existentes
+    existing_users = {
+        username for (username,) in db.session.query(User.username).filter(
+            User.username.in_(['admin', 'user'])
+        )
+    }
+    
     # Cria usuário admin padrão se não existir
-    admin = User.query.filter_by(username='admin').first()
-    if not admin:
+    if 'admin' not in existing_users:
         admin = User(username='admin', role='admin')
         admin.set_password('admin123')
         db.session.add(admin)
         print("✓ Usuário admin criado (admin/admin123)")
     
     # Cria usuário de teste se não existir
-    test_user = User.query.filter_by(username='user').first()
-    if not test_user:
+    if 'user' not in existing_users:
         test_user = User(username='user', role='user')
         test_user.set_password('user123')
         db.session.add(test_user)
@@ -29,15 +139,21 @@ def init_default_data():
         ('mp_access_token', 'APP_USR-4278668979689090-070320-0c429f571f0cc84734fbf354e55a26fe-1766003359'),
         ('mp_client_id', '4278668979689090'),
         ('mp_client_secret', 'ZjgOAqTY8QUXT4pOpa8erXTOnv2Qc6SO'),
+        ('mp_webhook_secret', ''),
         ('default_profit_margin', '0.2'),
         ('site_name', 'INFLUENCIANDO'),
         ('support_email', 'suporte@influenciando.com'),
         ('webhook_url', '')
     ]
     
+    existing_keys = {
+        key for (key,) in db.session.query(Setting.key).filter(
+            Setting.key.in_([key for key, _ in default_settings])
+        )
+    }
+    
     for key, value in default_settings:
-        setting = Setting.query.filter_by(key=key).first()
-        if not setting:
+        if key not in existing_keys:
             setting = Setting(key=key, value=value)
             db.session.add(setting)
             print(f"✓ Configuração criada: {key}")
@@ -54,5 +170,6 @@ def init_default_data():
 if __name__ == '__main__':
     from src.main import app
     with app.app_context():
+        migrate_schema()
         init_default_data()
 
@@ -3,62 +3,210 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+import click
 from flask import Flask, send_from_directory
 from flask_cors import CORS
-from src.models.user import db, User, Setting
-from src.routes.user import user_bp
-from src.routes.auth import auth_bp
-from src.routes.services import services_bp
-from src.routes.orders import orders_bp
-from src.routes.settings import settings_bp
-from src.routes.webhooks import webhooks_bp
-from src.routes.dashboard import dashboard_bp
-
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
-
-# Configuração CORS para permitir requisições do frontend
-CORS(app, supports_credentials=True)
-
-# Registra todos os blueprints
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(services_bp, url_prefix='/api')
-app.register_blueprint(orders_bp, url_prefix='/api')
-app.register_blueprint(settings_bp, url_prefix='/api')
-app.register_blueprint(webhooks_bp, url_prefix='/api/webhooks')
-app.register_blueprint(dashboard_bp, url_prefix='/api')
-
-# Configuração do banco de dados
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-
-def create_default_admin():
-    """Cria um usuário admin padrão se não existir"""
-    from src.init_data import init_default_data
+from src.models.user import db
+from src.services import analytics_db, tracing
+from src.services.write_queue import write_queue
+
+def register_blueprints(app):
+    """Registra todos os blueprints
+
+    Os módulos de rotas são importados apenas aqui, quando a aplicação é
+    criada, e não no import de src.main.
+    """
+    from src.routes.user import user_bp
+    from src.routes.auth import auth_bp
+    from src.routes.services import services_bp
+    from src.routes.orders import orders_bp
+    from src.routes.settings import settings_bp
+    from src.routes.webhooks import webhooks_bp
+    from src.routes.dashboard import dashboard_bp
+    from src.routes.pricing import pricing_bp
+    from src.routes.outbox import outbox_bp
+
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(services_bp, url_prefix='/api')
+    app.register_blueprint(orders_bp, url_prefix='/api')
+    app.register_blueprint(settings_bp, url_prefix='/api')
+    app.register_blueprint(webhooks_bp, url_prefix='/api/webhooks')
+    app.register_blueprint(dashboard_bp, url_prefix='/api')
+    app.register_blueprint(pricing_bp, url_prefix='/api')
+    app.register_blueprint(outbox_bp, url_prefix='/api')
+
+def register_commands(app):
+    """Registra os comandos de linha de comando (flask --app src.main <comando>)"""
+
+    @app.cli.command('migrate')
+    def migrate_command():
+        """Cria tabelas, colunas e índices que ainda não existem no banco"""
+        from src.init_data import migrate_schema
+        migrate_schema()
+
+    @app.cli.command('init')
+    def init_command():
+        """Aplica o schema e cria os dados padrão (usuários e configurações)"""
+        init_database()
+
+    @app.cli.command('rebuild-user-stats')
+    @click.option('--check', is_flag=True, help='Apenas lista as divergências, sem recriar')
+    def rebuild_user_stats_command(check):
+        """Recalcula os contadores de pedidos por usuário a partir dos pedidos"""
+        from src.services.user_stats import check_user_stats, rebuild_user_stats
+        mismatches = check_user_stats()
+        for mismatch in mismatches:
+            print(f"  usuário {mismatch['user_id']} / {mismatch['status']}: "
+                  f"esperado {mismatch['expected']}, atual {mismatch['current']}")
+        if check:
+            print(f"✓ {len(mismatches)} divergência(s) encontrada(s)")
+            return
+        rebuild_user_stats()
+        db.session.commit()
+        print(f"✓ Contadores recriados ({len(mismatches)} divergência(s) corrigida(s))")
+
+    @app.cli.command('run-jobs')
+    def run_jobs_command():
+        """Executa os jobs periódicos neste processo (sem servir requisições)"""
+        import time
+        from src.services.jobs import scheduler
+        scheduler.ensure_started(app)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            scheduler.stop()
+
+def register_scheduler(app):
+    """Inicia os jobs periódicos no primeiro request de cada worker
+
+    Iniciar no primeiro request (e não em create_app) faz com que as threads
+    sejam criadas dentro de cada worker, inclusive com gunicorn --preload.
+    Os leases garantem que cada job rode em um único processo por vez.
+    """
+    from src.services.jobs import scheduler
+
+    @app.before_request
+    def start_scheduler():
+        scheduler.ensure_started(app)
+
+def init_database():
+    """Cria o schema e os dados padrão do sistema"""
+    from src.init_data import migrate_schema, init_default_data
+    migrate_schema()
     init_default_data()
 
-with app.app_context():
-    db.create_all()
-    create_default_admin()
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
+def create_app(config=None):
+    """Cria e configura a aplicação Flask
+
+    O banco de dados não é acessado aqui: o schema e os dados padrão são
+    criados pelos comandos `init`/`migrate`. Para manter o comportamento
+    antigo, defina INIT_DB_ON_STARTUP=1; com `gunicorn --preload` isso roda
+    uma única vez no processo master, antes do fork dos workers.
+    """
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+
+    # Configuração do banco de dados
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+        'DATABASE_URL',
+        f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+    )
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Tempo (em segundos) que as respostas do dashboard ficam em cache
+    app.config['DASHBOARD_CACHE_TTL'] = float(os.environ.get('DASHBOARD_CACHE_TTL', 10))
+
+    # Idade máxima (em segundos) do status local antes de consultar o Barato Sociais
+    app.config['ORDER_STATUS_FRESHNESS'] = float(os.environ.get('ORDER_STATUS_FRESHNESS', 30))
+
+    # Consultas do dashboard em um snapshot do banco (ANALYTICS_SNAPSHOT=1)
+    app.config['ANALYTICS_SNAPSHOT'] = os.environ.get('ANALYTICS_SNAPSHOT') == '1'
+    app.config['ANALYTICS_SNAPSHOT_PATH'] = os.environ.get('ANALYTICS_SNAPSHOT_PATH')
+    app.config['ANALYTICS_SNAPSHOT_INTERVAL'] = float(
+        os.environ.get('ANALYTICS_SNAPSHOT_INTERVAL', 60)
+    ) if app.config['ANALYTICS_SNAPSHOT'] else 0
+
+    # Jobs periódicos (SCHEDULER_ENABLED=1) e seus intervalos em segundos
+    app.config['SCHEDULER_ENABLED'] = os.environ.get('SCHEDULER_ENABLED') == '1'
+    app.config['ORDER_SYNC_INTERVAL'] = float(os.environ.get('ORDER_SYNC_INTERVAL', 300))
+    app.config['REFILL_SYNC_INTERVAL'] = float(os.environ.get('REFILL_SYNC_INTERVAL', 600))
+    app.config['ORDER_ARCHIVE_INTERVAL'] = float(os.environ.get('ORDER_ARCHIVE_INTERVAL', 3600))
+    app.config['OUTBOX_INTERVAL'] = float(os.environ.get('OUTBOX_INTERVAL', 30))
+    app.config['PAYMENT_RECONCILE_INTERVAL'] = float(os.environ.get('PAYMENT_RECONCILE_INTERVAL', 600))
+    app.config['HEALTH_CHECK_INTERVAL'] = float(os.environ.get('HEALTH_CHECK_INTERVAL', 300))
+
+    # Período (em horas) dos pedidos pendentes verificados na conciliação de pagamentos
+    app.config['PAYMENT_RECONCILE_WINDOW_HOURS'] = float(os.environ.get('PAYMENT_RECONCILE_WINDOW_HOURS', 72))
+
+    # Novas tentativas de envio ao Barato Sociais: máximo de tentativas e backoff (segundos)
+    app.config['OUTBOX_MAX_ATTEMPTS'] = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 8))
+    app.config['OUTBOX_RETRY_BASE'] = float(os.environ.get('OUTBOX_RETRY_BASE', 30))
+    app.config['OUTBOX_RETRY_MAX'] = float(os.environ.get('OUTBOX_RETRY_MAX', 3600))
+
+    # Idade (em dias) a partir da qual pedidos finalizados são arquivados
+    app.config['ORDER_ARCHIVE_AGE_DAYS'] = float(os.environ.get('ORDER_ARCHIVE_AGE_DAYS', 90))
+
+    # Tracing: arquivo (JSON lines) ou URL do coletor Zipkin; vazio desativa
+    app.config['TRACING_EXPORT'] = os.environ.get('TRACING_EXPORT')
+    app.config['TRACING_SERVICE_NAME'] = os.environ.get('TRACING_SERVICE_NAME', 'influenciando')
+    app.config['TRACING_SAMPLE_RATE'] = float(os.environ.get('TRACING_SAMPLE_RATE', 1.0))
+
+    # Fila de escritas com commit em grupo (WRITE_QUEUE_ENABLED=1)
+    app.config['WRITE_QUEUE_ENABLED'] = os.environ.get('WRITE_QUEUE_ENABLED') == '1'
+    app.config['WRITE_QUEUE_MAX_ITEMS'] = int(os.environ.get('WRITE_QUEUE_MAX_ITEMS', 50))
+    app.config['WRITE_QUEUE_MAX_DELAY_MS'] = float(os.environ.get('WRITE_QUEUE_MAX_DELAY_MS', 5))
+    # Tempo máximo (segundos) que uma requisição espera pela sua escrita
+    app.config['WRITE_QUEUE_TIMEOUT'] = float(os.environ.get('WRITE_QUEUE_TIMEOUT', 10))
+
+    if config:
+        app.config.update(config)
+
+    # O código depende do SQLite (UPSERT do dialeto, FTS5, BEGIN IMMEDIATE, backup)
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite:'):
+        raise ValueError('Only SQLite databases are supported: DATABASE_URL must start with sqlite://')
+
+    # Configuração CORS para permitir requisições do frontend
+    CORS(app, supports_credentials=True)
+
+    register_blueprints(app)
+    register_commands(app)
+    db.init_app(app)
+    analytics_db.init_app(app)
+    tracing.init_app(app)
+    write_queue.init_app(app)
+
+    if app.config['SCHEDULER_ENABLED']:
+        register_scheduler(app)
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        static_folder_path = app.static_folder
+        if static_folder_path is None:
+                return "Static folder not configured", 404
+
+        if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
+            return send_from_directory(static_folder_path, path)
         else:
-            return "index.html not found", 404
+            index_path = os.path.join(static_folder_path, 'index.html')
+            if os.path.exists(index_path):
+                return send_from_directory(static_folder_path, 'index.html')
+            else:
+                return "index.html not found", 404
+
+    if os.environ.get('INIT_DB_ON_STARTUP') == '1':
+        with app.app_context():
+            init_database()
+            # Não deixa conexões abertas para serem herdadas pelos workers
+            db.engine.dispose()
+
+    return app
+
+app = create_app()
 
 if __name__ == '__main__':
+    with app.app_context():
+        init_database()
     app.run(host='0.0.0.0', port=5000, debug=True)
-
@@ -1,9 +1,14 @@
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+import json
+import zlib
 
 db = SQLAlchemy()
 
+# Status finais: o pedido não muda mais no Barato Sociais
+TERMINAL_ORDER_STATUSES = ['Completed', 'Partial', 'Canceled', 'Refunded']
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -36,9 +41,10 @@ class Service(db.Model):
     rate = db.Column(db.Float, nullable=False)
     min = db.Column(db.Integer)
     max = db.Column(db.Integer)
-    type = db.Column(db.String(50))
-    category = db.Column(db.String(100))
+    type = db.Column(db.String(50), index=True)
+    category = db.Column(db.String(100), index=True)
     profit_margin = db.Column(db.Float, nullable=False, default=0.2)  # 20% por padrão
+    content_hash = db.Column(db.String(64))  # hash dos dados recebidos do Barato Sociais
 
     def get_final_price(self):
         return self.rate * (1 + self.profit_margin)
@@ -67,12 +73,25 @@ class Order(db.Model):
     quantity = db.Column(db.Integer, nullable=False)
     price_paid = db.Column(db.Float, nullable=False)
     cost_to_us = db.Column(db.Float, nullable=False)
-    status = db.Column(db.String(50), nullable=False, default='Pending')
+    # active_history: o status anterior é carregado mesmo com o pedido expirado
+    # (após um commit), para que user_stats saiba de qual contador descontar
+    status = db.column_property(db.Column(db.String(50), nullable=False, default='Pending'), active_history=True)
     start_count = db.Column(db.Integer)
     remains = db.Column(db.Integer)
+    mp_preference_id = db.Column(db.String(100))  # preferência de pagamento do Mercado Pago
+    mp_payment_id = db.Column(db.String(50), index=True)  # pagamento do Mercado Pago
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # Índice de cobertura para os relatórios de vendas por período
+        db.Index('ix_order_created_at_sales', 'created_at', 'status', 'price_paid', 'cost_to_us'),
+        # Alterações recentes dos pedidos de um usuário (stream de status)
+        db.Index('ix_order_user_updated_at', 'user_id', 'updated_at'),
+        # Ids nunca são reutilizados: pedidos arquivados mantêm o id original
+        {'sqlite_autoincrement': True},
+    )
+
     # Relacionamentos
     user = db.relationship('User', backref=db.backref('orders', lazy=True))
     service = db.relationship('Service', backref=db.backref('orders', lazy=True))
@@ -90,12 +109,124 @@ class Order(db.Model):
             'status': self.status,
             'start_count': self.start_count,
             'remains': self.remains,
+            'mp_preference_id': self.mp_preference_id,
+            'mp_payment_id': self.mp_payment_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'user': self.user.to_dict() if self.user else None,
             'service': self.service.to_dict() if self.service else None
         }
 
+class OrderArchive(db.Model):
+    """Pedidos finalizados antigos, movidos da tabela order pelo job de arquivamento"""
+    __tablename__ = 'order_archive'
+
+    id = db.Column(db.Integer, primary_key=True)  # mesmo id do pedido original
+    order_id_barato_sociais = db.Column(db.Integer, unique=True, nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    service_id = db.Column(db.Integer, db.ForeignKey('service.id'), nullable=False)
+    link = db.Column(db.String(500), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    price_paid = db.Column(db.Float, nullable=False)
+    cost_to_us = db.Column(db.Float, nullable=False)
+    status = db.Column(db.String(50), nullable=False)
+    start_count = db.Column(db.Integer)
+    remains = db.Column(db.Integer)
+    mp_preference_id = db.Column(db.String(100))
+    mp_payment_id = db.Column(db.String(50))
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_order_archive_created_at_sales', 'created_at', 'status', 'price_paid', 'cost_to_us'),
+        db.Index('ix_order_archive_user_created_at', 'user_id', 'created_at'),
+    )
+
+    # Relacionamentos
+    user = db.relationship('User', viewonly=True)
+    service = db.relationship('Service', viewonly=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'order_id_barato_sociais': self.order_id_barato_sociais,
+            'user_id': self.user_id,
+            'service_id': self.service_id,
+            'link': self.link,
+            'quantity': self.quantity,
+            'price_paid': self.price_paid,
+            'cost_to_us': self.cost_to_us,
+            'status': self.status,
+            'start_count': self.start_count,
+            'remains': self.remains,
+            'mp_preference_id': self.mp_preference_id,
+            'mp_payment_id': self.mp_payment_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'archived_at': self.archived_at.isoformat() if self.archived_at else None,
+            'user': self.user.to_dict() if self.user else None,
+            'service': self.service.to_dict() if self.service else None
+        }
+
+class Refill(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    refill_id_barato_sociais = db.Column(db.Integer, unique=True, nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
+    status = db.Column(db.String(50), nullable=False, default='Pending')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relacionamentos
+    order = db.relationship('Order', backref=db.backref('refills', lazy=True))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'refill_id_barato_sociais': self.refill_id_barato_sociais,
+            'order_id': self.order_id,
+            'order_id_barato_sociais': self.order.order_id_barato_sociais if self.order else None,
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class RefillArchive(db.Model):
+    """Reposições finalizadas de pedidos arquivados, movidas junto com o pedido"""
+    __tablename__ = 'refill_archive'
+
+    id = db.Column(db.Integer, primary_key=True)  # mesmo id da reposição original
+    refill_id_barato_sociais = db.Column(db.Integer, unique=True, nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order_archive.id'), nullable=False, index=True)
+    status = db.Column(db.String(50), nullable=False)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Relacionamentos
+    order = db.relationship('OrderArchive', viewonly=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'refill_id_barato_sociais': self.refill_id_barato_sociais,
+            'order_id': self.order_id,
+            'order_id_barato_sociais': self.order.order_id_barato_sociais if self.order else None,
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'archived_at': self.archived_at.isoformat() if self.archived_at else None
+        }
+
+class UserStats(db.Model):
+    """Contadores de pedidos por usuário e status, atualizados na mesma transação dos pedidos"""
+    __tablename__ = 'user_stats'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    total_amount = db.Column(db.Float, nullable=False, default=0)
+
 class Setting(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     key = db.Column(db.String(100), unique=True, nullable=False)
@@ -108,3 +239,129 @@ class Setting(db.Model):
             'value': self.value
         }
 
+
+class PricingRule(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(20), nullable=False)  # global, category, type ou rate_band
+    value = db.Column(db.String(100))  # categoria ou tipo, conforme o escopo
+    min_rate = db.Column(db.Float)  # faixa de custo (rate_band): min_rate <= rate < max_rate
+    max_rate = db.Column(db.Float)
+    profit_margin = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'scope': self.scope,
+            'value': self.value,
+            'min_rate': self.min_rate,
+            'max_rate': self.max_rate,
+            'profit_margin': self.profit_margin,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class CatalogSnapshot(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False, index=True)
+    # Catálogo bruto em JSON, compactado com zlib; carregado só quando acessado
+    payload = db.deferred(db.Column(db.LargeBinary, nullable=False))
+    service_count = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Tamanho do payload calculado pelo banco (sem carregar o blob)
+    size_bytes = db.column_property(db.func.length(payload.columns[0]), deferred=True)
+
+    def get_services(self):
+        return json.loads(zlib.decompress(self.payload))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'content_hash': self.content_hash,
+            'service_count': self.service_count,
+            'size_bytes': self.size_bytes or 0,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class JobLease(db.Model):
+    name = db.Column(db.String(100), primary_key=True)  # nome do job periódico
+    owner = db.Column(db.String(200), nullable=False)  # processo que detém o lease
+    expires_at = db.Column(db.DateTime, nullable=False)
+    heartbeat_at = db.Column(db.DateTime, nullable=False)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'owner': self.owner,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None
+        }
+
+class OutboxMessage(db.Model):
+    """Envio pendente ao Barato Sociais, gravado na mesma transação do pedido"""
+    __tablename__ = 'outbox_message'
+    __table_args__ = (
+        # Busca das mensagens prontas para nova tentativa
+        db.Index('ix_outbox_message_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
+    kind = db.Column(db.String(50), nullable=False)  # ex.: submit_order
+    payload = db.Column(db.Text, nullable=False)  # JSON com os parâmetros da chamada
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, delivered, dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    delivered_at = db.Column(db.DateTime)
+
+    # Relacionamentos
+    order = db.relationship('Order', backref=db.backref('outbox_messages', lazy=True))
+
+    def get_payload(self):
+        return json.loads(self.payload)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'order_id': self.order_id,
+            'kind': self.kind,
+            'payload': self.get_payload(),
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'delivered_at': self.delivered_at.isoformat() if self.delivered_at else None
+        }
+
+class ProviderHealth(db.Model):
+    """Último resultado da verificação de cada API externa (job check_provider_health)"""
+    __tablename__ = 'provider_health'
+
+    provider = db.Column(db.String(50), primary_key=True)  # barato_sociais, mercado_pago
+    status = db.Column(db.String(20), nullable=False)  # success, error, not_configured
+    message = db.Column(db.Text)
+    latency_ms = db.Column(db.Float)
+    balance = db.Column(db.String(50))
+    currency = db.Column(db.String(10))
+    checked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'provider': self.provider,
+            'status': self.status,
+            'message': self.message,
+            'latency_ms': self.latency_ms,
+            'balance': self.balance,
+            'currency': self.currency,
+            'checked_at': self.checked_at.isoformat() if self.checked_at else None
+        }
+
+class WebhookNotification(db.Model):
+    """x-request-id das notificações do Mercado Pago já aceitas (proteção contra replay)"""
+    __tablename__ = 'webhook_notification'
+
+    request_id = db.Column(db.String(100), primary_key=True)
+    seen_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify, session
 from src.models.user import db, User
+from src.services.user_stats import get_user_stats
 from functools import wraps
 
 auth_bp = Blueprint('auth', __name__)
@@ -72,7 +73,10 @@ def get_current_user():
     try:
         user = User.query.get(session['user_id'])
         if user:
-            return jsonify({'user': user.to_dict()}), 200
+            return jsonify({
+                'user': user.to_dict(),
+                'stats': get_user_stats([user.id])[user.id]
+            }), 200
         else:
             return jsonify({'error': 'User not found'}), 404
     except Exception as e:
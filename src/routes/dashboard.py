@@ -1,54 +1,85 @@
-from flask import Blueprint, jsonify
-from src.models.user import db, Order, Service, User
+from flask import Blueprint, request, jsonify
+from src.models.user import Order, OrderArchive, Service, User
 from src.routes.auth import admin_required
-from sqlalchemy import func, desc
-from datetime import datetime, timedelta
+from src.services.analytics_db import get_analytics_session
+from src.services.cache import ResponseCache, cached_response
+from src.services.order_events import on_order_change
+from sqlalchemy import func, desc, select, union_all
+from datetime import datetime, timedelta, timezone
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
+# Status cujos pedidos contam como receita
+REVENUE_STATUSES = ['Paid', 'Processing', 'Completed']
+
+# Os relatórios somam os pedidos ativos e os arquivados
+ORDER_MODELS = (Order, OrderArchive)
+
+# Cache das respostas do dashboard (TTL em app.config['DASHBOARD_CACHE_TTL'])
+dashboard_cache = ResponseCache()
+
+@on_order_change
+def invalidate_dashboard_cache(changes):
+    """Marca o cache do dashboard como sujo quando pedidos são criados ou alterados"""
+    dashboard_cache.invalidate()
+
 @dashboard_bp.route('/dashboard/stats', methods=['GET'])
 @admin_required
+@cached_response(dashboard_cache, 'DASHBOARD_CACHE_TTL')
 def get_dashboard_stats():
     """Obtém estatísticas gerais para o dashboard"""
     try:
+        analytics = get_analytics_session()
+        
         # Estatísticas básicas
-        total_orders = Order.query.count()
-        total_users = User.query.count()
-        total_services = Service.query.count()
+        total_users = analytics.query(User).count()
+        total_services = analytics.query(Service).count()
         
-        # Receita total
-        total_revenue = db.session.query(func.sum(Order.price_paid)).filter(
-            Order.status.in_(['Paid', 'Processing', 'Completed'])
-        ).scalar() or 0
+        total_orders = 0
+        total_revenue = 0
+        total_cost = 0
+        status_stats = {}
+        recent_orders = 0
+        recent_revenue = 0
+        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
         
-        # Custo total
-        total_cost = db.session.query(func.sum(Order.cost_to_us)).filter(
-            Order.status.in_(['Paid', 'Processing', 'Completed'])
-        ).scalar() or 0
+        # Soma os pedidos ativos e os arquivados
+        for model in ORDER_MODELS:
+            total_orders += analytics.query(func.count(model.id)).scalar() or 0
+            
+            # Receita e custo totais
+            revenue, cost = analytics.query(
+                func.sum(model.price_paid),
+                func.sum(model.cost_to_us)
+            ).filter(
+                model.status.in_(REVENUE_STATUSES)
+            ).one()
+            total_revenue += revenue or 0
+            total_cost += cost or 0
+            
+            # Pedidos por status
+            orders_by_status = analytics.query(
+                model.status,
+                func.count(model.id)
+            ).group_by(model.status).all()
+            
+            for status, count in orders_by_status:
+                status_stats[status] = status_stats.get(status, 0) + count
+            
+            # Pedidos dos últimos 30 dias
+            recent_orders += analytics.query(func.count(model.id)).filter(
+                model.created_at >= thirty_days_ago
+            ).scalar() or 0
+            
+            # Receita dos últimos 30 dias
+            recent_revenue += analytics.query(func.sum(model.price_paid)).filter(
+                model.created_at >= thirty_days_ago,
+                model.status.in_(REVENUE_STATUSES)
+            ).scalar() or 0
         
         # Lucro total
         total_profit = total_revenue - total_cost
         
-        # Pedidos por status
-        orders_by_status = db.session.query(
-            Order.status,
-            func.count(Order.id)
-        ).group_by(Order.status).all()
-        
-        status_stats = {status: count for status, count in orders_by_status}
-        
-        # Pedidos dos últimos 30 dias
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        recent_orders = Order.query.filter(
-            Order.created_at >= thirty_days_ago
-        ).count()
-        
-        # Receita dos últimos 30 dias
-        recent_revenue = db.session.query(func.sum(Order.price_paid)).filter(
-            Order.created_at >= thirty_days_ago,
-            Order.status.in_(['Paid', 'Processing', 'Completed'])
-        ).scalar() or 0
-        
         return jsonify({
             'total_orders': total_orders,
             'total_users': total_users,
@@ -64,48 +95,159 @@ def get_dashboard_stats():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Expressões SQLite que truncam created_at para o início de cada intervalo
+SALES_CHART_BUCKETS = {
+    'hour': lambda column: func.strftime('%Y-%m-%d %H:00:00', column),
+    'day': lambda column: func.strftime('%Y-%m-%d', column),
+    'week': lambda column: func.date(column, '-6 days', 'weekday 1'),
+    'month': lambda column: func.strftime('%Y-%m-01', column)
+}
+
+# Formato das chaves geradas pelas expressões acima
+SALES_CHART_KEY_FORMATS = {
+    'hour': '%Y-%m-%d %H:00:00',
+    'day': '%Y-%m-%d',
+    'week': '%Y-%m-%d',
+    'month': '%Y-%m-01'
+}
+
+SALES_CHART_MAX_BUCKETS = 10000
+
+def _bucket_start(moment, bucket):
+    """Trunca uma data para o início do intervalo que a contém"""
+    if bucket == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+def _next_bucket(moment, bucket):
+    """Retorna o início do intervalo seguinte"""
+    if bucket == 'hour':
+        return moment + timedelta(hours=1)
+    if bucket == 'week':
+        return moment + timedelta(weeks=1)
+    if bucket == 'month':
+        if moment.month == 12:
+            return moment.replace(year=moment.year + 1, month=1)
+        return moment.replace(month=moment.month + 1)
+    return moment + timedelta(days=1)
+
+def _parse_chart_date(value, default):
+    if not value:
+        return default
+    moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    # As datas do banco são UTC sem fuso: converte antes de descartar o offset
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
 @dashboard_bp.route('/dashboard/sales-chart', methods=['GET'])
 @admin_required
+@cached_response(dashboard_cache, 'DASHBOARD_CACHE_TTL')
 def get_sales_chart():
-    """Obtém dados para gráfico de vendas dos últimos 30 dias"""
+    """Obtém dados para gráfico de vendas em um período
+
+    Parâmetros opcionais: from e to (datas ISO, padrão: últimos 30 dias) e
+    bucket (hour, day, week ou month; padrão: day). Os intervalos sem
+    vendas são retornados zerados.
+    """
     try:
-        # Últimos 30 dias
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+        bucket = request.args.get('bucket', 'day')
+        if bucket not in SALES_CHART_BUCKETS:
+            return jsonify({'error': 'bucket must be one of: hour, day, week, month'}), 400
+        
+        try:
+            now = datetime.utcnow()
+            date_to = _parse_chart_date(request.args.get('to'), now)
+            date_from = _parse_chart_date(request.args.get('from'), date_to - timedelta(days=30))
+        except ValueError:
+            return jsonify({'error': 'from and to must be ISO 8601 dates'}), 400
+        
+        if date_from > date_to:
+            return jsonify({'error': 'from must be before to'}), 400
         
-        # Vendas por dia
-        daily_sales = db.session.query(
-            func.date(Order.created_at).label('date'),
-            func.count(Order.id).label('orders'),
-            func.sum(Order.price_paid).label('revenue')
-        ).filter(
-            Order.created_at >= thirty_days_ago,
-            Order.status.in_(['Paid', 'Processing', 'Completed'])
-        ).group_by(func.date(Order.created_at)).order_by('date').all()
+        # Gera todos os intervalos do período (inclusive os vazios)
+        buckets = []
+        current = _bucket_start(date_from, bucket)
+        while current <= date_to:
+            buckets.append(current)
+            if len(buckets) > SALES_CHART_MAX_BUCKETS:
+                return jsonify({'error': f'Too many buckets (max {SALES_CHART_MAX_BUCKETS})'}), 400
+            current = _next_bucket(current, bucket)
+        
+        # Uma consulta agrupada sobre o intervalo [início, fim) de created_at
+        # (na tabela de pedidos e na de pedidos arquivados)
+        analytics = get_analytics_session()
+        sales_by_bucket = {}
+        for model in ORDER_MODELS:
+            bucket_expression = SALES_CHART_BUCKETS[bucket](model.created_at).label('bucket')
+            sales = analytics.query(
+                bucket_expression,
+                func.count().label('orders'),
+                func.sum(model.price_paid).label('revenue'),
+                func.sum(model.cost_to_us).label('cost')
+            ).filter(
+                model.created_at >= buckets[0],
+                model.created_at < current,
+                model.status.in_(REVENUE_STATUSES)
+            ).group_by(bucket_expression).all()
+            
+            # Soma os pedidos ativos e os arquivados do mesmo intervalo
+            for sale in sales:
+                orders, revenue, cost = sales_by_bucket.get(sale.bucket, (0, 0.0, 0.0))
+                sales_by_bucket[sale.bucket] = (
+                    orders + sale.orders,
+                    revenue + float(sale.revenue or 0),
+                    cost + float(sale.cost or 0)
+                )
+        
+        key_format = SALES_CHART_KEY_FORMATS[bucket]
         
         chart_data = []
-        for sale in daily_sales:
+        for moment in buckets:
+            orders, revenue, cost = sales_by_bucket.get(moment.strftime(key_format), (0, 0.0, 0.0))
             chart_data.append({
-                'date': sale.date.isoformat(),
-                'orders': sale.orders,
-                'revenue': round(float(sale.revenue or 0), 2)
+                'date': moment.isoformat() if bucket == 'hour' else moment.date().isoformat(),
+                'orders': orders,
+                'revenue': round(revenue, 2),
+                'cost': round(cost, 2),
+                'profit': round(revenue - cost, 2)
             })
         
-        return jsonify({'sales_chart': chart_data}), 200
+        return jsonify({
+            'sales_chart': chart_data,
+            'bucket': bucket,
+            'from': buckets[0].isoformat(),
+            'to': current.isoformat()
+        }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @dashboard_bp.route('/dashboard/top-services', methods=['GET'])
 @admin_required
+@cached_response(dashboard_cache, 'DASHBOARD_CACHE_TTL')
 def get_top_services():
     """Obtém os serviços mais vendidos"""
     try:
-        top_services = db.session.query(
+        analytics = get_analytics_session()
+        
+        # Pedidos pagos ativos e arquivados
+        paid_orders = union_all(
+            select(Order.service_id, Order.price_paid).where(Order.status.in_(REVENUE_STATUSES)),
+            select(OrderArchive.service_id, OrderArchive.price_paid).where(OrderArchive.status.in_(REVENUE_STATUSES))
+        ).subquery()
+        
+        top_services = analytics.query(
             Service.name,
-            func.count(Order.id).label('order_count'),
-            func.sum(Order.price_paid).label('total_revenue')
-        ).join(Order).filter(
-            Order.status.in_(['Paid', 'Processing', 'Completed'])
+            func.count().label('order_count'),
+            func.sum(paid_orders.c.price_paid).label('total_revenue')
+        ).join(
+            paid_orders, paid_orders.c.service_id == Service.id
         ).group_by(Service.id, Service.name).order_by(
             desc('order_count')
         ).limit(10).all()
@@ -125,10 +267,13 @@ def get_top_services():
 
 @dashboard_bp.route('/dashboard/recent-orders', methods=['GET'])
 @admin_required
+@cached_response(dashboard_cache, 'DASHBOARD_CACHE_TTL')
 def get_recent_orders():
     """Obtém os pedidos mais recentes"""
     try:
-        recent_orders = Order.query.order_by(
+        analytics = get_analytics_session()
+        
+        recent_orders = analytics.query(Order).order_by(
             desc(Order.created_at)
         ).limit(10).all()
         
@@ -1,48 +1,128 @@
-from flask import Blueprint, request, jsonify, session
-from src.models.user import db, Order, Service, User
+from flask import Blueprint, Response, current_app, request, jsonify, session, stream_with_context
+from src.models.user import db, Order, OrderArchive, Refill, RefillArchive, Service, User, TERMINAL_ORDER_STATUSES
 from src.routes.auth import admin_required, login_required
-from src.services.barato_sociais_api import BaratoSociaisAPI
-from src.services.mercado_pago_api import MercadoPagoAPI
-from src.models.user import Setting
-from datetime import datetime
+from src.services.settings_cache import settings_cache
+from src.services.batch_operations import cancel_orders, chunked, request_refills, sync_refill_statuses
+from src.services.order_stream import parse_last_event_id, stream_order_updates
+from src.services.archive import get_order_or_archived
+from src.services.json_stream import STREAM_BATCH_SIZE, stream_json_list
+from src.services.conditional_get import is_not_modified, make_etag, not_modified, set_validators
+from src.services.outbox import deliver_message, enqueue_order_submission
+from src.services.payments import reconcile_payments
+from src.services.cache import SingleFlight
+from src.services.write_queue import write_queue
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from datetime import datetime, timedelta
+import heapq
 
 orders_bp = Blueprint('orders', __name__)
 
+# Consultas de status em andamento, por pedido
+order_status_flight = SingleFlight()
+
 def get_barato_sociais_api():
     """Obtém uma instância da API do Barato Sociais"""
-    api_key_setting = Setting.query.filter_by(key='barato_sociais_api_key').first()
-    if not api_key_setting:
+    from src.services.barato_sociais_api import BaratoSociaisAPI
+    
+    api_key = settings_cache.get('barato_sociais_api_key')
+    if api_key is None:
         return None
-    return BaratoSociaisAPI(api_key_setting.value)
+    return BaratoSociaisAPI(api_key)
 
 def get_mercado_pago_api():
     """Obtém uma instância da API do Mercado Pago"""
-    access_token_setting = Setting.query.filter_by(key='mp_access_token').first()
-    if not access_token_setting:
+    from src.services.mercado_pago_api import MercadoPagoAPI
+    
+    access_token = settings_cache.get('mp_access_token')
+    if access_token is None:
         return None
-    return MercadoPagoAPI(access_token_setting.value)
+    return MercadoPagoAPI(access_token)
+
+def orders_list_version(user, include_archived):
+    """ETag e Last-Modified da lista de pedidos visível para o usuário
+
+    Usa a quantidade e o maior updated_at dos pedidos (índice user_id +
+    updated_at) e a quantidade de pedidos arquivados: qualquer pedido novo,
+    alterado ou arquivado muda a ETag.
+    """
+    orders = db.session.query(func.count(Order.id), func.max(Order.updated_at))
+    archived = db.session.query(func.count(OrderArchive.id))
+    if user.role != 'admin':
+        orders = orders.filter(Order.user_id == user.id)
+        archived = archived.filter(OrderArchive.user_id == user.id)
+    
+    order_count, last_modified = orders.one()
+    archived_count = archived.scalar() if include_archived else None
+    
+    etag = make_etag('orders', user.role, user.id, include_archived, order_count, last_modified, archived_count)
+    return etag, last_modified
 
 @orders_bp.route('/orders', methods=['GET'])
 @login_required
 def get_orders():
-    """Obtém a lista de pedidos"""
+    """Obtém a lista de pedidos (enviada em streaming, dos mais recentes aos mais antigos)
+
+    Parâmetro opcional: archived=1 inclui os pedidos arquivados.
+    """
     try:
         user_id = session.get('user_id')
         user = User.query.get(user_id)
         
-        if user.role == 'admin':
-            # Admin vê todos os pedidos
-            orders = Order.query.order_by(Order.created_at.desc()).all()
-        else:
-            # Usuário comum vê apenas seus pedidos
-            orders = Order.query.filter_by(user_id=user_id).order_by(Order.created_at.desc()).all()
-        
-        return jsonify({
-            'orders': [order.to_dict() for order in orders]
-        }), 200
+        # Pedidos arquivados só com archived=1 (a lista normal lê apenas a tabela ativa)
+        include_archived = request.args.get('archived') == '1'
+        
+        # Versão da lista: quantidade e último updated_at (consultas só nos índices)
+        etag, last_modified = orders_list_version(user, include_archived)
+        if is_not_modified(etag, last_modified):
+            return not_modified(etag, last_modified)
+        
+        # Admin vê todos os pedidos; usuário comum vê apenas os seus
+        orders = Order.query.options(joinedload(Order.user), joinedload(Order.service))
+        if user.role != 'admin':
+            orders = orders.filter_by(user_id=user_id)
+        orders = orders.order_by(Order.created_at.desc()).yield_per(STREAM_BATCH_SIZE)
+        
+        # Inclui os pedidos arquivados, se solicitado
+        if include_archived:
+            archived = OrderArchive.query.options(
+                joinedload(OrderArchive.user), joinedload(OrderArchive.service)
+            )
+            if user.role != 'admin':
+                archived = archived.filter_by(user_id=user_id)
+            archived = archived.order_by(OrderArchive.created_at.desc()).yield_per(STREAM_BATCH_SIZE)
+            
+            # As duas consultas já vêm ordenadas: intercala sem carregar tudo em memória
+            orders = heapq.merge(
+                orders, archived,
+                key=lambda order: order.created_at or datetime.min,
+                reverse=True
+            )
+        
+        response = stream_json_list('orders', (order.to_dict() for order in orders))
+        return set_validators(response, etag, last_modified)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def insert_order(user_id, service_id, link, quantity, price_paid, cost_to_us):
+    """Grava um novo pedido aguardando pagamento e retorna o seu id (usado pela fila de escritas)"""
+    order = Order(
+        user_id=user_id,
+        service_id=service_id,
+        link=link,
+        quantity=quantity,
+        price_paid=price_paid,
+        cost_to_us=cost_to_us,
+        status='Pending Payment'
+    )
+    db.session.add(order)
+    db.session.flush()
+    return order.id
+
+def set_order_preference(order_id, preference_id):
+    """Guarda o id da preferência de pagamento do pedido (usado pela fila de escritas)"""
+    Order.query.filter_by(id=order_id).update({'mp_preference_id': preference_id})
+
 @orders_bp.route('/orders', methods=['POST'])
 @login_required
 def create_order():
@@ -66,19 +146,16 @@ def create_order():
         price_paid = service.get_final_price() * quantity
         
         # Cria o pedido no banco de dados (inicialmente sem order_id_barato_sociais)
-        order = Order(
+        order_id = write_queue.submit(
+            insert_order,
             user_id=session['user_id'],
             service_id=service_id,
             link=link,
             quantity=quantity,
             price_paid=price_paid,
-            cost_to_us=cost_to_us,
-            status='Pending Payment'
+            cost_to_us=cost_to_us
         )
         
-        db.session.add(order)
-        db.session.commit()
-        
         # Cria a preferência de pagamento no Mercado Pago
         mp_api = get_mercado_pago_api()
         if not mp_api:
@@ -87,12 +164,16 @@ def create_order():
         payment_preference = mp_api.create_payment_preference(
             title=f"{service.name} - {quantity} unidades",
             price=price_paid,
-            external_reference=str(order.id)
+            external_reference=str(order_id)
         )
         
         if 'error' in payment_preference:
             return jsonify({'error': payment_preference['error']}), 400
         
+        # Guarda a preferência para a conciliação de pagamentos
+        write_queue.submit(set_order_preference, order_id, payment_preference.get('id'))
+        order = Order.query.get(order_id)
+        
         return jsonify({
             'message': 'Order created successfully',
             'order': order.to_dict(),
@@ -104,6 +185,26 @@ def create_order():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@orders_bp.route('/orders/stream', methods=['GET'])
+@login_required
+def stream_orders():
+    """Stream (Server-Sent Events) com as alterações de status dos pedidos do usuário
+
+    Envia um evento "order" com status, start_count e remains sempre que um
+    pedido do usuário muda. Substitui o polling de /orders/<id>/status.
+    """
+    user_id = session['user_id']
+    since = parse_last_event_id(request.headers.get('Last-Event-ID'))
+    
+    return Response(
+        stream_with_context(stream_order_updates(user_id, since)),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @orders_bp.route('/orders/<int:order_id>/process', methods=['POST'])
 @admin_required
 def process_order(order_id):
@@ -121,23 +222,22 @@ def process_order(order_id):
         if not api:
             return jsonify({'error': 'Barato Sociais API not configured'}), 400
         
-        # Cria o pedido no Barato Sociais
-        response = api.create_order(
-            service_id=order.service.service_id_barato_sociais,
-            link=order.link,
-            quantity=order.quantity
-        )
-        
-        if 'error' in response:
-            return jsonify({'error': response['error']}), 400
-        
-        # Atualiza o pedido com o ID do Barato Sociais
-        order.order_id_barato_sociais = response.get('order')
-        order.status = 'Processing'
-        order.updated_at = datetime.utcnow()
+        # Grava o envio na outbox junto com a mudança de status do pedido
+        message = enqueue_order_submission(order)
+        db.session.commit()
         
+        # Primeira tentativa imediata; em caso de falha o job deliver_outbox tenta novamente
+        response = deliver_message(api, message)
         db.session.commit()
         
+        if message.status != 'delivered':
+            return jsonify({
+                'message': 'Order queued for submission',
+                'order': order.to_dict(),
+                'outbox_message': message.to_dict(),
+                'error': message.last_error
+            }), 202
+        
         return jsonify({
             'message': 'Order processed successfully',
             'order': order.to_dict(),
@@ -148,12 +248,41 @@ def process_order(order_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def order_status_is_stale(order):
+    """Indica se o status do pedido precisa ser consultado no Barato Sociais"""
+    if not order.order_id_barato_sociais or order.status in TERMINAL_ORDER_STATUSES:
+        return False
+    
+    freshness = current_app.config.get('ORDER_STATUS_FRESHNESS', 0)
+    if not order.updated_at or freshness <= 0:
+        return True
+    return datetime.utcnow() - order.updated_at > timedelta(seconds=freshness)
+
+def refresh_order_status(order):
+    """Consulta o status de um pedido no Barato Sociais e atualiza o banco de dados"""
+    api = get_barato_sociais_api()
+    if not api:
+        return None
+    
+    status_response = api.get_order_status(order.order_id_barato_sociais)
+    
+    if 'error' not in status_response:
+        # Atualiza o status no banco de dados
+        order.status = status_response.get('status', order.status)
+        order.start_count = status_response.get('start_count', order.start_count)
+        order.remains = status_response.get('remains', order.remains)
+        order.updated_at = datetime.utcnow()
+        
+        db.session.commit()
+    
+    return status_response
+
 @orders_bp.route('/orders/<int:order_id>/status', methods=['GET'])
 @login_required
 def get_order_status(order_id):
-    """Obtém o status atualizado de um pedido"""
+    """Obtém o status atualizado de um pedido (inclusive pedidos arquivados)"""
     try:
-        order = Order.query.get(order_id)
+        order = get_order_or_archived(order_id)
         if not order:
             return jsonify({'error': 'Order not found'}), 404
         
@@ -164,26 +293,60 @@ def get_order_status(order_id):
         if user.role != 'admin' and order.user_id != user_id:
             return jsonify({'error': 'Access denied'}), 403
         
-        # Se o pedido tem ID do Barato Sociais, consulta o status
-        if order.order_id_barato_sociais:
-            api = get_barato_sociais_api()
-            if api:
-                status_response = api.get_order_status(order.order_id_barato_sociais)
-                
-                if 'error' not in status_response:
-                    # Atualiza o status no banco de dados
-                    order.status = status_response.get('status', order.status)
-                    order.start_count = status_response.get('start_count', order.start_count)
-                    order.remains = status_response.get('remains', order.remains)
-                    order.updated_at = datetime.utcnow()
-                    
-                    db.session.commit()
-        
-        return jsonify({'order': order.to_dict()}), 200
+        # Consulta o Barato Sociais apenas se o status local estiver desatualizado;
+        # requisições simultâneas para o mesmo pedido compartilham a mesma consulta
+        if order_status_is_stale(order):
+            order_status_flight.do(order.id, lambda: refresh_order_status(order))
+            db.session.expire(order)
+        
+        # 304 se o cliente já tem esta versão do pedido (antes de serializar)
+        etag = make_etag(order.__tablename__, order.id, order.updated_at)
+        if is_not_modified(etag, order.updated_at):
+            return not_modified(etag, order.updated_at)
+        
+        response = jsonify({'order': order.to_dict()})
+        return set_validators(response, etag, order.updated_at), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def sync_active_orders(api):
+    """Atualiza em lote o status de todos os pedidos ativos; não faz commit
+
+    Retorna um dicionário com a quantidade de pedidos ativos, de pedidos
+    atualizados e o erro do Barato Sociais, se houver.
+    """
+    # Obtém pedidos que têm ID do Barato Sociais e não estão finalizados
+    active_orders = Order.query.filter(
+        Order.order_id_barato_sociais.isnot(None),
+        Order.status.notin_(TERMINAL_ORDER_STATUSES)
+    ).all()
+    
+    orders_by_upstream_id = {order.order_id_barato_sociais: order for order in active_orders}
+    updated_count = 0
+    
+    # Consulta o status em lotes
+    for batch in chunked(list(orders_by_upstream_id)):
+        status_response = api.get_multiple_order_status(batch)
+        
+        if 'error' in status_response:
+            return {'active': len(active_orders), 'updated': updated_count, 'error': status_response['error']}
+        
+        # Atualiza cada pedido do lote
+        for upstream_id in batch:
+            order_status = status_response.get(str(upstream_id))
+            if not order_status or 'error' in order_status:
+                continue
+            
+            order = orders_by_upstream_id[upstream_id]
+            order.status = order_status.get('status', order.status)
+            order.start_count = order_status.get('start_count', order.start_count)
+            order.remains = order_status.get('remains', order.remains)
+            order.updated_at = datetime.utcnow()
+            updated_count += 1
+    
+    return {'active': len(active_orders), 'updated': updated_count, 'error': None}
+
 @orders_bp.route('/orders/sync-status', methods=['POST'])
 @admin_required
 def sync_orders_status():
@@ -193,44 +356,188 @@ def sync_orders_status():
         if not api:
             return jsonify({'error': 'Barato Sociais API not configured'}), 400
         
-        # Obtém pedidos que têm ID do Barato Sociais e não estão finalizados
-        active_orders = Order.query.filter(
-            Order.order_id_barato_sociais.isnot(None),
-            Order.status.notin_(['Completed', 'Canceled', 'Refunded'])
-        ).all()
+        result = sync_active_orders(api)
+        
+        if result['error']:
+            db.session.rollback()
+            return jsonify({'error': result['error']}), 400
         
-        if not active_orders:
+        if not result['active']:
             return jsonify({'message': 'No active orders to sync'}), 200
         
-        # Obtém os IDs para consulta em lote
-        order_ids = [order.order_id_barato_sociais for order in active_orders]
+        updated_count = result['updated']
         
-        # Consulta o status em lote
-        status_response = api.get_multiple_order_status(order_ids)
+        db.session.commit()
         
-        if 'error' in status_response:
-            return jsonify({'error': status_response['error']}), 400
+        return jsonify({
+            'message': 'Orders status synchronized successfully',
+            'updated_count': updated_count
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@orders_bp.route('/orders/reconcile-payments', methods=['POST'])
+@admin_required
+def reconcile_payments_route():
+    """Concilia com o Mercado Pago os pedidos que ainda aguardam pagamento
+
+    Parâmetro opcional: hours (período de criação dos pedidos considerados).
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        hours = float(data.get('hours', current_app.config['PAYMENT_RECONCILE_WINDOW_HOURS']))
         
-        updated_count = 0
+        mp_api = get_mercado_pago_api()
+        if not mp_api:
+            return jsonify({'error': 'Mercado Pago not configured'}), 400
         
-        # Atualiza cada pedido
-        for order in active_orders:
-            order_status = status_response.get(str(order.order_id_barato_sociais))
-            if order_status:
-                order.status = order_status.get('status', order.status)
-                order.start_count = order_status.get('start_count', order.start_count)
-                order.remains = order_status.get('remains', order.remains)
-                order.updated_at = datetime.utcnow()
-                updated_count += 1
+        result = reconcile_payments(mp_api, hours)
+        if result['error']:
+            db.session.rollback()
+            return jsonify({'error': result['error']}), 400
         
         db.session.commit()
         
         return jsonify({
-            'message': 'Orders status synchronized successfully',
-            'updated_count': updated_count
+            'message': f"Reconciled {result['updated']} of {result['pending']} pending orders",
+            'pending_orders': result['pending'],
+            'updated_count': result['updated']
         }), 200
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def load_submitted_orders(order_ids):
+    """Carrega pedidos já enviados ao Barato Sociais; retorna (pedidos, ids ignorados)"""
+    orders = Order.query.filter(
+        Order.id.in_(order_ids),
+        Order.order_id_barato_sociais.isnot(None)
+    ).all()
+    found_ids = {order.id for order in orders}
+    skipped = [order_id for order_id in order_ids if order_id not in found_ids]
+    return orders, skipped
+
+def get_order_ids_from_request():
+    data = request.get_json(silent=True) or {}
+    order_ids = data.get('order_ids')
+    if not isinstance(order_ids, list) or not order_ids:
+        return None
+    try:
+        return list(dict.fromkeys(int(order_id) for order_id in order_ids))
+    except (TypeError, ValueError):
+        return None
+
+@orders_bp.route('/orders/refill', methods=['POST'])
+@admin_required
+def refill_orders():
+    """Solicita reposição de vários pedidos em chamadas em lote ao Barato Sociais"""
+    try:
+        order_ids = get_order_ids_from_request()
+        if not order_ids:
+            return jsonify({'error': 'order_ids must be a non-empty list of order IDs'}), 400
+        
+        api = get_barato_sociais_api()
+        if not api:
+            return jsonify({'error': 'Barato Sociais API not configured'}), 400
+        
+        orders, skipped = load_submitted_orders(order_ids)
+        refills, failed = request_refills(api, orders) if orders else ([], [])
+        
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Refill requests sent',
+            'refills': [refill.to_dict() for refill in refills],
+            'failed': failed,
+            'skipped': skipped
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@orders_bp.route('/orders/cancel', methods=['POST'])
+@admin_required
+def cancel_orders_route():
+    """Solicita o cancelamento de vários pedidos em chamadas em lote ao Barato Sociais
+
+    O status local é atualizado pela sincronização de status, quando o
+    Barato Sociais confirmar o cancelamento.
+    """
+    try:
+        order_ids = get_order_ids_from_request()
+        if not order_ids:
+            return jsonify({'error': 'order_ids must be a non-empty list of order IDs'}), 400
+        
+        api = get_barato_sociais_api()
+        if not api:
+            return jsonify({'error': 'Barato Sociais API not configured'}), 400
+        
+        orders, skipped = load_submitted_orders(order_ids)
+        canceled, failed = cancel_orders(api, orders) if orders else ([], [])
+        
+        return jsonify({
+            'message': 'Cancel requests sent',
+            'canceled': canceled,
+            'failed': failed,
+            'skipped': skipped
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@orders_bp.route('/refills', methods=['GET'])
+@admin_required
+def get_refills():
+    """Obtém as reposições solicitadas (filtro opcional por status ou order_id)"""
+    try:
+        query = Refill.query
+        
+        status = request.args.get('status')
+        if status:
+            query = query.filter(Refill.status == status)
+        
+        order_id = request.args.get('order_id', type=int)
+        if order_id:
+            query = query.filter(Refill.order_id == order_id)
+        
+        refills = query.order_by(Refill.created_at.desc()).all()
+        
+        # Reposições de um pedido arquivado estão em refill_archive
+        if order_id:
+            archived = RefillArchive.query.filter(RefillArchive.order_id == order_id)
+            if status:
+                archived = archived.filter(RefillArchive.status == status)
+            refills += archived.order_by(RefillArchive.created_at.desc()).all()
+        
+        return jsonify({
+            'refills': [refill.to_dict() for refill in refills]
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@orders_bp.route('/refills/sync-status', methods=['POST'])
+@admin_required
+def sync_refills_status():
+    """Sincroniza em lote o status de todas as reposições em andamento"""
+    try:
+        api = get_barato_sociais_api()
+        if not api:
+            return jsonify({'error': 'Barato Sociais API not configured'}), 400
+        
+        updated_count, failed = sync_refill_statuses(api)
+        
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Refills status synchronized successfully',
+            'updated_count': updated_count,
+            'failed': failed
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
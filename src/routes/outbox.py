@@ -0,0 +1,80 @@
+from flask import Blueprint, request, jsonify
+from src.models.user import db, OutboxMessage
+from src.routes.auth import admin_required
+from src.services.outbox import claim_message, deliver_message, replay_message
+
+outbox_bp = Blueprint('outbox', __name__)
+
+OUTBOX_PAGE_SIZE = 50
+OUTBOX_MAX_PAGE_SIZE = 200
+
+def get_barato_sociais_api():
+    from src.routes.orders import get_barato_sociais_api as get_api
+    return get_api()
+
+@outbox_bp.route('/outbox', methods=['GET'])
+@admin_required
+def get_outbox_messages():
+    """Lista as mensagens da outbox (filtros: status e order_id)
+
+    Paginação por cursor: a resposta traz next_cursor, que deve ser enviado
+    como cursor para obter a próxima página (mensagens mais antigas).
+    """
+    try:
+        query = OutboxMessage.query
+        
+        status = request.args.get('status')
+        if status:
+            query = query.filter(OutboxMessage.status == status)
+        
+        order_id = request.args.get('order_id', type=int)
+        if order_id is not None:
+            query = query.filter(OutboxMessage.order_id == order_id)
+        
+        limit = request.args.get('limit', OUTBOX_PAGE_SIZE, type=int)
+        limit = min(max(limit, 1), OUTBOX_MAX_PAGE_SIZE)
+        cursor = request.args.get('cursor', type=int)
+        if cursor is not None:
+            query = query.filter(OutboxMessage.id < cursor)
+        
+        messages = query.order_by(OutboxMessage.id.desc()).limit(limit + 1).all()
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        
+        return jsonify({
+            'messages': [message.to_dict() for message in messages],
+            'next_cursor': messages[-1].id if has_more else None
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@outbox_bp.route('/outbox/<int:message_id>/replay', methods=['POST'])
+@admin_required
+def replay_outbox_message(message_id):
+    """Recoloca uma mensagem na fila e tenta entregá-la imediatamente"""
+    try:
+        message = OutboxMessage.query.get(message_id)
+        if not message:
+            return jsonify({'error': 'Message not found'}), 404
+        
+        try:
+            replay_message(message)
+        except LookupError as e:
+            return jsonify({'error': str(e)}), 404
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 409
+        db.session.commit()
+        
+        api = get_barato_sociais_api()
+        if api and claim_message(message.id):
+            deliver_message(api, message)
+            db.session.commit()
+        
+        return jsonify({
+            'message': 'Message delivered' if message.status == 'delivered' else 'Message queued for retry',
+            'outbox_message': message.to_dict()
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,103 @@
+from flask import Blueprint, request, jsonify
+from src.models.user import db, PricingRule
+from src.routes.auth import admin_required
+from src.services.pricing import apply_pricing_rules, preview_pricing, validate_rule
+
+pricing_bp = Blueprint('pricing', __name__)
+
+@pricing_bp.route('/pricing-rules', methods=['GET'])
+@admin_required
+def get_pricing_rules():
+    """Obtém as regras de precificação"""
+    try:
+        rules = PricingRule.query.order_by(PricingRule.id).all()
+        return jsonify({
+            'pricing_rules': [rule.to_dict() for rule in rules]
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@pricing_bp.route('/pricing-rules', methods=['POST'])
+@admin_required
+def create_pricing_rule():
+    """Cria uma regra de precificação e reaplica todas as regras
+
+    Com "dry_run": true a regra não é salva e a resposta apenas informa
+    quantos serviços seriam alterados e as variações de preço.
+    """
+    try:
+        data = request.get_json() or {}
+        
+        try:
+            rule = validate_rule(data)
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        
+        rules = PricingRule.query.all() + [rule]
+        
+        if data.get('dry_run'):
+            return jsonify({
+                'dry_run': True,
+                'pricing_rule': rule.to_dict(),
+                'preview': preview_pricing(rules)
+            }), 200
+        
+        preview = preview_pricing(rules)
+        db.session.add(rule)
+        db.session.flush()
+        updated_count = apply_pricing_rules(rules)
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Pricing rule created successfully',
+            'pricing_rule': rule.to_dict(),
+            'preview': preview,
+            'updated_count': updated_count
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@pricing_bp.route('/pricing-rules/<int:rule_id>', methods=['DELETE'])
+@admin_required
+def delete_pricing_rule(rule_id):
+    """Remove uma regra de precificação (as margens atuais são mantidas)"""
+    try:
+        rule = PricingRule.query.get(rule_id)
+        if not rule:
+            return jsonify({'error': 'Pricing rule not found'}), 404
+        
+        db.session.delete(rule)
+        db.session.commit()
+        
+        return jsonify({'message': 'Pricing rule deleted successfully'}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@pricing_bp.route('/pricing-rules/apply', methods=['POST'])
+@admin_required
+def apply_rules():
+    """Reaplica todas as regras a todo o catálogo (ou apenas simula, com dry_run)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        preview = preview_pricing()
+        
+        if data.get('dry_run'):
+            return jsonify({'dry_run': True, 'preview': preview}), 200
+        
+        updated_count = apply_pricing_rules()
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Pricing rules applied successfully',
+            'preview': preview,
+            'updated_count': updated_count
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
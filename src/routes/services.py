@@ -1,25 +1,109 @@
 from flask import Blueprint, request, jsonify
-from src.models.user import db, Service, Setting
+from sqlalchemy import update
+from src.models.user import db, CatalogSnapshot, Service
 from src.routes.auth import admin_required, login_required
-from src.services.barato_sociais_api import BaratoSociaisAPI
+from src.services.settings_cache import settings_cache
+from src.services.json_stream import STREAM_BATCH_SIZE, stream_json_list
+from src.services.catalog import (
+    bump_catalog_version, category_counts, content_hash, diff_snapshots,
+    get_latest_snapshot, store_snapshot
+)
+from src.services.pricing import apply_pricing_rules, get_default_profit_margin
+from src.services.service_search import index_services, search_services
 
 services_bp = Blueprint('services', __name__)
 
 def get_barato_sociais_api():
     """Obtém uma instância da API do Barato Sociais com a chave configurada"""
-    api_key_setting = Setting.query.filter_by(key='barato_sociais_api_key').first()
-    if not api_key_setting:
+    from src.services.barato_sociais_api import BaratoSociaisAPI
+    
+    api_key = settings_cache.get('barato_sociais_api_key')
+    if api_key is None:
         return None
-    return BaratoSociaisAPI(api_key_setting.value)
+    return BaratoSociaisAPI(api_key)
+
+SERVICES_PAGE_SIZE = 50
+SERVICES_MAX_PAGE_SIZE = 200
 
 @services_bp.route('/services', methods=['GET'])
 @login_required
 def get_services():
-    """Obtém a lista de serviços disponíveis"""
+    """Obtém a lista de serviços disponíveis
+
+    Filtros opcionais: category, type, min_price e max_price (preço final).
+    A paginação é ativada por limit ou cursor: a resposta traz next_cursor,
+    que deve ser enviado como cursor para obter a próxima página.
+    """
     try:
-        services = Service.query.all()
+        query = Service.query
+        
+        category = request.args.get('category')
+        if category:
+            query = query.filter(Service.category == category)
+        
+        service_type = request.args.get('type')
+        if service_type:
+            query = query.filter(Service.type == service_type)
+        
+        final_price = Service.rate * (1 + Service.profit_margin)
+        min_price = request.args.get('min_price', type=float)
+        if min_price is not None:
+            query = query.filter(final_price >= min_price)
+        
+        max_price = request.args.get('max_price', type=float)
+        if max_price is not None:
+            query = query.filter(final_price <= max_price)
+        
+        query = query.order_by(Service.id)
+        
+        if 'limit' not in request.args and 'cursor' not in request.args:
+            # Sem paginação: lista completa enviada em streaming
+            return stream_json_list(
+                'services',
+                (service.to_dict() for service in query.yield_per(STREAM_BATCH_SIZE))
+            )
+        
+        # Paginação por cursor (id do último serviço da página anterior)
+        limit = request.args.get('limit', SERVICES_PAGE_SIZE, type=int)
+        limit = min(max(limit, 1), SERVICES_MAX_PAGE_SIZE)
+        cursor = request.args.get('cursor', type=int)
+        if cursor is not None:
+            query = query.filter(Service.id > cursor)
+        
+        services = query.limit(limit + 1).all()
+        has_more = len(services) > limit
+        services = services[:limit]
+        
         return jsonify({
-            'services': [service.to_dict() for service in services]
+            'services': [service.to_dict() for service in services],
+            'next_cursor': services[-1].id if has_more else None
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@services_bp.route('/services/search', methods=['GET'])
+@login_required
+def search_services_route():
+    """Busca serviços por nome, descrição e categoria (paginado, por relevância)"""
+    try:
+        query = request.args.get('q', '').strip()
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 20, type=int)
+        
+        if not query:
+            return jsonify({'error': 'q is required'}), 400
+        
+        page = max(page, 1)
+        per_page = min(max(per_page, 1), 100)
+        
+        services, total = search_services(query, page=page, per_page=per_page)
+        
+        return jsonify({
+            'services': [service.to_dict() for service in services],
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'pages': (total + per_page - 1) // per_page
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -39,56 +123,158 @@ def sync_services():
         if 'error' in response:
             return jsonify({'error': response['error']}), 400
         
-        # Atualiza ou cria serviços no banco de dados
-        updated_count = 0
-        created_count = 0
+        if not isinstance(response, list):
+            return jsonify({'error': 'Unexpected services response'}), 400
+        
+        # Catálogo idêntico ao último snapshot: nada a processar
+        catalog_hash = content_hash(response)
+        latest_snapshot = get_latest_snapshot()
+        if latest_snapshot and latest_snapshot.content_hash == catalog_hash:
+            return jsonify({
+                'message': 'Services catalog unchanged',
+                'created': 0,
+                'updated': 0,
+                'unchanged': len(response),
+                'snapshot_id': latest_snapshot.id
+            }), 200
+        
+        snapshot = store_snapshot(response, catalog_hash)
+        
+        # Hash atual de cada serviço (e os campos usados pelas regras de
+        # precificação), carregados em uma única consulta
+        existing = {
+            row.service_id_barato_sociais: row for row in db.session.query(
+                Service.service_id_barato_sociais, Service.id, Service.content_hash,
+                Service.category, Service.type, Service.rate
+            )
+        }
+        
+        # Atualiza ou cria apenas os serviços cujo hash mudou
+        updates = []
+        repriced_ids = []
+        new_services = []
+        unchanged_count = 0
+        default_margin = get_default_profit_margin()
         
         for service_data in response:
             service_id = service_data.get('service')
+            service_hash = content_hash(service_data)
+            fields = {
+                'name': service_data.get('name', ''),
+                'description': service_data.get('description', ''),
+                'rate': float(service_data.get('rate', 0)),
+                'min': service_data.get('min'),
+                'max': service_data.get('max'),
+                'type': service_data.get('type', ''),
+                'category': service_data.get('category', ''),
+                'content_hash': service_hash
+            }
             
-            # Verifica se o serviço já existe
-            existing_service = Service.query.filter_by(
-                service_id_barato_sociais=service_id
-            ).first()
-            
-            if existing_service:
+            if service_id in existing:
+                current = existing[service_id]
+                if current.content_hash == service_hash:
+                    unchanged_count += 1
+                    continue
                 # Atualiza serviço existente
-                existing_service.name = service_data.get('name', '')
-                existing_service.description = service_data.get('description', '')
-                existing_service.rate = float(service_data.get('rate', 0))
-                existing_service.min = service_data.get('min')
-                existing_service.max = service_data.get('max')
-                existing_service.type = service_data.get('type', '')
-                existing_service.category = service_data.get('category', '')
-                updated_count += 1
+                updates.append(dict(fields, id=current.id))
+                # Mudou algum campo usado pelas regras: a margem precisa ser recalculada
+                if (fields['category'], fields['type'], fields['rate']) != (current.category, current.type, current.rate):
+                    repriced_ids.append(current.id)
             else:
                 # Cria novo serviço
                 new_service = Service(
                     service_id_barato_sociais=service_id,
-                    name=service_data.get('name', ''),
-                    description=service_data.get('description', ''),
-                    rate=float(service_data.get('rate', 0)),
-                    min=service_data.get('min'),
-                    max=service_data.get('max'),
-                    type=service_data.get('type', ''),
-                    category=service_data.get('category', ''),
-                    profit_margin=0.2  # 20% de margem padrão
+                    profit_margin=default_margin,
+                    **fields
                 )
                 db.session.add(new_service)
-                created_count += 1
+                new_services.append(new_service)
         
+        if updates:
+            db.session.execute(update(Service), updates)
+        db.session.flush()
+        
+        new_ids = [service.id for service in new_services]
+        
+        # Resolve pelas regras de precificação a margem dos serviços novos e
+        # dos que mudaram de categoria, tipo ou custo
+        if new_ids or repriced_ids:
+            apply_pricing_rules(service_ids=new_ids + repriced_ids)
+        
+        # Reindexa na busca apenas os serviços alterados
+        index_services([item['id'] for item in updates] + new_ids)
+        
+        version = bump_catalog_version()
         db.session.commit()
         
+        # Atualiza a contagem por categoria deste processo
+        category_counts.refresh(version)
+        
         return jsonify({
             'message': 'Services synchronized successfully',
-            'created': created_count,
-            'updated': updated_count
+            'created': len(new_services),
+            'updated': len(updates),
+            'unchanged': unchanged_count,
+            'snapshot_id': snapshot.id
         }), 200
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@services_bp.route('/services/snapshots', methods=['GET'])
+@admin_required
+def get_catalog_snapshots():
+    """Lista os snapshots do catálogo do Barato Sociais (mais recentes primeiro)"""
+    try:
+        # Só o tamanho do payload, calculado no banco (o blob não é carregado)
+        snapshots = CatalogSnapshot.query.options(
+            db.undefer(CatalogSnapshot.size_bytes)
+        ).order_by(CatalogSnapshot.id.desc()).all()
+        return jsonify({
+            'snapshots': [snapshot.to_dict() for snapshot in snapshots]
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@services_bp.route('/services/changelog', methods=['GET'])
+@admin_required
+def get_catalog_changelog():
+    """Mudanças de preço, serviços adicionados e removidos entre dois snapshots
+
+    Por padrão compara o último snapshot com o anterior; use snapshot=<id>
+    para escolher o snapshot e since=<id> para o snapshot de comparação.
+    """
+    try:
+        snapshot_id = request.args.get('snapshot', type=int)
+        if snapshot_id:
+            snapshot = CatalogSnapshot.query.get(snapshot_id)
+        else:
+            snapshot = get_latest_snapshot()
+        
+        if not snapshot:
+            return jsonify({'error': 'Snapshot not found'}), 404
+        
+        since_id = request.args.get('since', type=int)
+        if since_id:
+            previous = CatalogSnapshot.query.get(since_id)
+            if not previous:
+                return jsonify({'error': 'Snapshot not found'}), 404
+        else:
+            previous = CatalogSnapshot.query.filter(
+                CatalogSnapshot.id < snapshot.id
+            ).order_by(CatalogSnapshot.id.desc()).first()
+        
+        changes = diff_snapshots(previous, snapshot)
+        
+        return jsonify({
+            'snapshot': snapshot.to_dict(),
+            'previous_snapshot': previous.to_dict() if previous else None,
+            **changes
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @services_bp.route('/services/<int:service_id>', methods=['PUT'])
 @admin_required
 def update_service(service_id):
@@ -110,6 +296,10 @@ def update_service(service_id):
         if 'description' in data:
             service.description = data['description']
         
+        if 'name' in data or 'description' in data:
+            db.session.flush()
+            index_services([service.id])
+        
         db.session.commit()
         
         return jsonify({
@@ -137,12 +327,14 @@ def get_service(service_id):
 @services_bp.route('/services/categories', methods=['GET'])
 @login_required
 def get_categories():
-    """Obtém as categorias de serviços disponíveis"""
+    """Obtém as categorias de serviços disponíveis e a quantidade de serviços em cada uma"""
     try:
-        categories = db.session.query(Service.category).distinct().all()
-        category_list = [cat[0] for cat in categories if cat[0]]
+        counts = category_counts.get()
         
-        return jsonify({'categories': category_list}), 200
+        return jsonify({
+            'categories': list(counts.keys()),
+            'counts': counts
+        }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
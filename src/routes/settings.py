@@ -1,23 +1,34 @@
 from flask import Blueprint, request, jsonify
 from src.models.user import db, Setting
 from src.routes.auth import admin_required
+from src.services.health import get_provider_health, refresh_provider_health
+from src.services.catalog import CATALOG_VERSION_KEY
+from src.services.settings_cache import SETTINGS_VERSION_KEY, bump_settings_version, settings_cache, upsert_settings
 
 settings_bp = Blueprint('settings', __name__)
 
+# Trechos do nome que indicam um valor sensível (chaves API, tokens, segredos)
+SENSITIVE_KEY_MARKERS = ('key', 'token', 'secret')
+
+# Versões internas (invalidação de caches): não são lidas nem alteradas pela API
+RESERVED_SETTING_KEYS = {SETTINGS_VERSION_KEY, CATALOG_VERSION_KEY}
+
+def mask_setting_value(key, value):
+    """Oculta o valor de configurações sensíveis"""
+    if any(marker in key.lower() for marker in SENSITIVE_KEY_MARKERS):
+        return '***' if value else ''
+    return value
+
 @settings_bp.route('/settings', methods=['GET'])
 @admin_required
 def get_settings():
     """Obtém todas as configurações"""
     try:
-        settings = Setting.query.all()
+        settings = Setting.query.filter(Setting.key.notin_(RESERVED_SETTING_KEYS)).all()
         settings_dict = {}
         
         for setting in settings:
-            # Oculta valores sensíveis (chaves API)
-            if 'key' in setting.key.lower() or 'token' in setting.key.lower():
-                settings_dict[setting.key] = '***' if setting.value else ''
-            else:
-                settings_dict[setting.key] = setting.value
+            settings_dict[setting.key] = mask_setting_value(setting.key, setting.value)
         
         return jsonify({'settings': settings_dict}), 200
     except Exception as e:
@@ -33,28 +44,23 @@ def update_settings():
         if not data:
             return jsonify({'error': 'No data provided'}), 400
         
-        updated_count = 0
-        
-        for key, value in data.items():
-            # Ignora valores mascarados
-            if value == '***':
-                continue
-                
-            setting = Setting.query.filter_by(key=key).first()
-            
-            if setting:
-                setting.value = str(value)
-            else:
-                setting = Setting(key=key, value=str(value))
-                db.session.add(setting)
-            
-            updated_count += 1
+        reserved = sorted(RESERVED_SETTING_KEYS.intersection(data))
+        if reserved:
+            return jsonify({'error': f"Keys managed internally: {', '.join(reserved)}"}), 400
         
+        # Ignora valores mascarados
+        values = {key: value for key, value in data.items() if value != '***'}
+        
+        # Uma consulta para os valores atuais e um único upsert (com a nova versão)
+        created, updated = upsert_settings(values)
         db.session.commit()
+        settings_cache.invalidate()
         
         return jsonify({
             'message': 'Settings updated successfully',
-            'updated_count': updated_count
+            'updated_count': len(created) + len(updated),
+            'created': created,
+            'updated': updated
         }), 200
         
     except Exception as e:
@@ -68,17 +74,12 @@ def get_setting(key):
     try:
         setting = Setting.query.filter_by(key=key).first()
         
-        if not setting:
+        if not setting or key in RESERVED_SETTING_KEYS:
             return jsonify({'error': 'Setting not found'}), 404
         
-        # Oculta valores sensíveis
-        value = setting.value
-        if 'key' in key.lower() or 'token' in key.lower():
-            value = '***' if value else ''
-        
         return jsonify({
             'key': setting.key,
-            'value': value
+            'value': mask_setting_value(setting.key, setting.value)
         }), 200
         
     except Exception as e:
@@ -89,6 +90,9 @@ def get_setting(key):
 def update_setting(key):
     """Atualiza uma configuração específica"""
     try:
+        if key in RESERVED_SETTING_KEYS:
+            return jsonify({'error': f'{key} is managed internally'}), 400
+        
         data = request.get_json()
         value = data.get('value')
         
@@ -107,7 +111,9 @@ def update_setting(key):
             setting = Setting(key=key, value=str(value))
             db.session.add(setting)
         
+        bump_settings_version()
         db.session.commit()
+        settings_cache.invalidate()
         
         return jsonify({
             'message': 'Setting updated successfully',
@@ -123,13 +129,18 @@ def update_setting(key):
 def delete_setting(key):
     """Remove uma configuração"""
     try:
+        if key in RESERVED_SETTING_KEYS:
+            return jsonify({'error': f'{key} is managed internally'}), 400
+        
         setting = Setting.query.filter_by(key=key).first()
         
         if not setting:
             return jsonify({'error': 'Setting not found'}), 404
         
         db.session.delete(setting)
+        bump_settings_version()
         db.session.commit()
+        settings_cache.invalidate()
         
         return jsonify({'message': 'Setting deleted successfully'}), 200
         
@@ -137,59 +148,28 @@ def delete_setting(key):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@settings_bp.route('/settings/test-apis', methods=['POST'])
+@settings_bp.route('/settings/test-apis', methods=['GET', 'POST'])
 @admin_required
 def test_apis():
-    """Testa as configurações das APIs"""
+    """Retorna o último status das APIs externas (atualizado pelo job de saúde)
+
+    As APIs só são consultadas aqui com force=1 (query string ou JSON) ou se
+    ainda não houver nenhum resultado gravado. As verificações são somente
+    leitura: nenhuma preferência de pagamento é criada.
+    """
     try:
-        from src.services.barato_sociais_api import BaratoSociaisAPI
-        from src.services.mercado_pago_api import MercadoPagoAPI
-        
-        results = {}
-        
-        # Testa API do Barato Sociais
-        barato_key = Setting.query.filter_by(key='barato_sociais_api_key').first()
-        if barato_key and barato_key.value:
-            try:
-                api = BaratoSociaisAPI(barato_key.value)
-                balance_response = api.get_balance()
-                
-                if 'error' in balance_response:
-                    results['barato_sociais'] = {'status': 'error', 'message': balance_response['error']}
-                else:
-                    results['barato_sociais'] = {
-                        'status': 'success', 
-                        'balance': balance_response.get('balance', 'N/A'),
-                        'currency': balance_response.get('currency', 'N/A')
-                    }
-            except Exception as e:
-                results['barato_sociais'] = {'status': 'error', 'message': str(e)}
-        else:
-            results['barato_sociais'] = {'status': 'not_configured', 'message': 'API key not set'}
-        
-        # Testa API do Mercado Pago
-        mp_token = Setting.query.filter_by(key='mp_access_token').first()
-        if mp_token and mp_token.value:
-            try:
-                # Para testar o MP, tentamos criar uma preferência de teste
-                mp_api = MercadoPagoAPI(mp_token.value)
-                test_preference = mp_api.create_payment_preference(
-                    title="Teste de Configuração",
-                    price=1.0,
-                    external_reference="test"
-                )
-                
-                if 'error' in test_preference:
-                    results['mercado_pago'] = {'status': 'error', 'message': test_preference['error']}
-                else:
-                    results['mercado_pago'] = {'status': 'success', 'message': 'API configured correctly'}
-            except Exception as e:
-                results['mercado_pago'] = {'status': 'error', 'message': str(e)}
-        else:
-            results['mercado_pago'] = {'status': 'not_configured', 'message': 'Access token not set'}
+        data = request.get_json(silent=True) or {}
+        force = request.args.get('force') == '1' or data.get('force') in (True, 1, '1')
+        
+        health = get_provider_health()
+        if force or any(result is None for result in health.values()):
+            refresh_provider_health()
+            db.session.commit()
+            health = get_provider_health()
         
-        return jsonify({'test_results': results}), 200
+        return jsonify({'test_results': health}), 200
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
@@ -1,21 +1,83 @@
 from flask import Blueprint, request, jsonify
 from src.models.user import db, User
 from src.routes.auth import admin_required, login_required
+from src.services.json_stream import STREAM_BATCH_SIZE, batched, stream_json_list
+from src.services.user_stats import get_user_stats
 
 user_bp = Blueprint('user', __name__)
 
+USERS_PAGE_SIZE = 50
+USERS_MAX_PAGE_SIZE = 200
+
+def username_prefix_filter(prefix):
+    """Filtro de prefixo como intervalo (username >= prefixo e < próximo prefixo)
+
+    Diferente de LIKE (que no SQLite ignora maiúsculas e não usa o índice),
+    o intervalo é resolvido pelo índice único de User.username.
+    """
+    upper_bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return db.and_(User.username >= prefix, User.username < upper_bound)
+
 @user_bp.route('/users', methods=['GET'])
 @admin_required
 def get_users():
-    """Obtém a lista de todos os usuários (apenas admin)"""
+    """Obtém a lista de usuários (apenas admin)
+
+    Filtros opcionais: q (prefixo do username) e role. Com include_stats=1
+    cada usuário traz seus contadores de pedidos. A paginação é ativada por
+    limit ou cursor: a resposta traz next_cursor, que deve ser enviado como
+    cursor para obter a próxima página.
+    """
     try:
-        users = User.query.all()
+        query = User.query
+        
+        prefix = request.args.get('q', '').strip()
+        if prefix:
+            query = query.filter(username_prefix_filter(prefix))
+        
+        role = request.args.get('role')
+        if role:
+            query = query.filter(User.role == role)
+        
+        query = query.order_by(User.id)
+        
+        include_stats = request.args.get('include_stats') == '1'
+        
+        if 'limit' not in request.args and 'cursor' not in request.args:
+            # Sem paginação: lista completa enviada em streaming
+            return stream_json_list('users', iter_users_data(query.yield_per(STREAM_BATCH_SIZE), include_stats))
+        
+        # Paginação por cursor (id do último usuário da página anterior)
+        limit = request.args.get('limit', USERS_PAGE_SIZE, type=int)
+        limit = min(max(limit, 1), USERS_MAX_PAGE_SIZE)
+        cursor = request.args.get('cursor', type=int)
+        if cursor is not None:
+            query = query.filter(User.id > cursor)
+        
+        users = query.limit(limit + 1).all()
+        has_more = len(users) > limit
+        users = users[:limit]
+        
         return jsonify({
-            'users': [user.to_dict() for user in users]
+            'users': list(iter_users_data(users, include_stats)),
+            'next_cursor': users[-1].id if has_more else None
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def iter_users_data(users, include_stats=False):
+    """Gera os dicionários dos usuários, com os contadores de pedidos se pedido
+
+    Os contadores (user_stats) são lidos com uma consulta por lote de usuários.
+    """
+    for batch in batched(users):
+        users_data = [user.to_dict() for user in batch]
+        if include_stats:
+            stats = get_user_stats([user.id for user in batch])
+            for user_data in users_data:
+                user_data['stats'] = stats[user_data['id']]
+        yield from users_data
+
 @user_bp.route('/users/<int:user_id>', methods=['GET'])
 @admin_required
 def get_user(user_id):
@@ -25,7 +87,10 @@ def get_user(user_id):
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        return jsonify({'user': user.to_dict()}), 200
+        return jsonify({
+            'user': user.to_dict(),
+            'stats': get_user_stats([user.id])[user.id]
+        }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
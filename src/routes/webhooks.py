@@ -1,27 +1,58 @@
 from flask import Blueprint, request, jsonify
-from src.models.user import db, Order, Setting
-from src.services.mercado_pago_api import MercadoPagoAPI
-from datetime import datetime
+from src.models.user import db
+from src.services.payments import apply_payment_to_order
+from src.services.settings_cache import settings_cache
+from src.services.webhook_security import seen_notifications, verify_signature
+from src.services.write_queue import write_queue
 
 webhooks_bp = Blueprint('webhooks', __name__)
 
 def get_mercado_pago_api():
     """Obtém uma instância da API do Mercado Pago"""
-    access_token_setting = Setting.query.filter_by(key='mp_access_token').first()
-    if not access_token_setting:
+    from src.services.mercado_pago_api import MercadoPagoAPI
+    
+    access_token = settings_cache.get('mp_access_token')
+    if access_token is None:
         return None
-    return MercadoPagoAPI(access_token_setting.value)
+    return MercadoPagoAPI(access_token)
+
+def verify_notification(notification_data):
+    """Valida a assinatura x-signature; retorna o motivo da recusa ou None
+
+    Enquanto a chave secreta do webhook (mp_webhook_secret) não estiver
+    configurada, as notificações são aceitas sem verificação.
+    """
+    secret = settings_cache.get('mp_webhook_secret')
+    if not secret:
+        return None
+    
+    data_id = request.args.get('data.id') or (notification_data.get('data') or {}).get('id')
+    return verify_signature(
+        secret,
+        request.headers.get('x-signature'),
+        request.headers.get('x-request-id'),
+        data_id
+    )
 
 @webhooks_bp.route('/mercadopago', methods=['POST'])
 def mercadopago_webhook():
     """Webhook para receber notificações do Mercado Pago"""
     try:
         # Obtém os dados da notificação
-        notification_data = request.get_json()
+        notification_data = request.get_json(silent=True)
         
         if not notification_data:
             return jsonify({'error': 'No data received'}), 400
         
+        # Descarta notificações forjadas ou repetidas antes de consultar o Mercado Pago
+        rejection = verify_notification(notification_data)
+        if rejection:
+            return jsonify({'error': rejection}), 401
+        
+        request_id = request.headers.get('x-request-id')
+        if request_id and seen_notifications.seen(request_id):
+            return jsonify({'message': 'Duplicate notification ignored'}), 200
+        
         # Verifica se é uma notificação de pagamento
         if notification_data.get('type') != 'payment':
             return jsonify({'message': 'Notification type not handled'}), 200
@@ -47,37 +78,19 @@ def mercadopago_webhook():
         if not external_reference:
             return jsonify({'error': 'External reference not found'}), 400
         
-        # Busca o pedido no banco de dados
-        order = Order.query.get(int(external_reference))
-        if not order:
-            return jsonify({'error': 'Order not found'}), 404
-        
         # Atualiza o status do pedido baseado no status do pagamento
-        payment_status = payment_info.get('status')
-        
-        if payment_status == 'approved':
-            order.status = 'Paid'
-        elif payment_status == 'rejected':
-            order.status = 'Payment Rejected'
-        elif payment_status == 'cancelled':
-            order.status = 'Payment Cancelled'
-        elif payment_status == 'pending':
-            order.status = 'Pending Payment'
-        elif payment_status == 'in_process':
-            order.status = 'Payment Processing'
-        elif payment_status == 'refunded':
-            order.status = 'Refunded'
-        else:
-            order.status = f'Payment {payment_status}'
-        
-        order.updated_at = datetime.utcnow()
+        order_data = write_queue.submit(apply_payment_to_order, int(external_reference), payment_info)
+        if not order_data:
+            return jsonify({'error': 'Order not found'}), 404
         
-        db.session.commit()
+        if request_id:
+            seen_notifications.add(request_id)
+            db.session.commit()
         
         return jsonify({
             'message': 'Webhook processed successfully',
-            'order_id': order.id,
-            'new_status': order.status
+            'order_id': order_data['order_id'],
+            'new_status': order_data['status']
         }), 200
         
     except Exception as e:
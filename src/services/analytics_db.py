@@ -0,0 +1,101 @@
+"""
+Conexão somente leitura para as consultas analíticas (dashboard)
+
+As agregações do dashboard usam uma sessão própria, ligada a um engine
+somente leitura (mode=ro + PRAGMA query_only) e separado do engine de
+escrita. Com o banco em modo WAL, essas leituras longas não bloqueiam os
+commits do webhook e da criação de pedidos.
+
+Opcionalmente (ANALYTICS_SNAPSHOT=1) as consultas usam uma cópia do
+app.db atualizada periodicamente com a API de backup do SQLite, de modo
+que os relatórios nem sequer tocam o arquivo principal.
+"""
+import os
+import sqlite3
+from flask import current_app
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import NullPool
+from src.models.user import db
+
+# Páginas copiadas por passo do backup (o lock de leitura é liberado entre os passos)
+BACKUP_PAGES_PER_STEP = 1024
+
+def get_database_path(app=None):
+    """Caminho do arquivo SQLite principal (None se o banco não for um arquivo SQLite)"""
+    app = app or current_app
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+        return None
+    return url.database
+
+def get_snapshot_path(app=None):
+    app = app or current_app
+    path = app.config.get('ANALYTICS_SNAPSHOT_PATH')
+    if path:
+        return path
+    database_path = get_database_path(app)
+    if not database_path:
+        return None
+    root, ext = os.path.splitext(database_path)
+    return f'{root}.analytics{ext or ".db"}'
+
+def _connect_read_only(app):
+    def connect():
+        path = get_database_path(app)
+        snapshot_path = get_snapshot_path(app)
+        # Usa o snapshot se ele estiver ativado e já existir
+        if app.config.get('ANALYTICS_SNAPSHOT') and snapshot_path and os.path.exists(snapshot_path):
+            path = snapshot_path
+
+        connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+        connection.execute('PRAGMA query_only = 1')
+        return connection
+    return connect
+
+def init_app(app):
+    """Cria o engine e a sessão analítica da aplicação"""
+    if get_database_path(app):
+        # Sem pool: cada sessão abre o arquivo atual (o snapshot pode ter sido trocado)
+        engine = create_engine('sqlite://', creator=_connect_read_only(app), poolclass=NullPool)
+    else:
+        engine = create_engine(app.config['SQLALCHEMY_DATABASE_URI'])
+
+    session = scoped_session(sessionmaker(bind=engine))
+    app.extensions['analytics_session'] = session
+
+    @app.teardown_appcontext
+    def remove_analytics_session(exception=None):
+        session.remove()
+
+def get_analytics_session():
+    """Sessão somente leitura da aplicação atual"""
+    return current_app.extensions['analytics_session']
+
+def enable_wal():
+    """Ativa o journal WAL no banco principal (leitores não bloqueiam o escritor)"""
+    if get_database_path():
+        db.session.execute(db.text('PRAGMA journal_mode = WAL'))
+
+def refresh_snapshot():
+    """Atualiza o snapshot analítico com a API de backup do SQLite"""
+    source_path = get_database_path()
+    snapshot_path = get_snapshot_path()
+    if not source_path or not snapshot_path:
+        return False
+
+    temp_path = f'{snapshot_path}.tmp'
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(temp_path)
+    try:
+        source.backup(target, pages=BACKUP_PAGES_PER_STEP)
+        # O snapshot é aberto somente leitura: não pode depender dos arquivos do WAL
+        target.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        target.close()
+        source.close()
+
+    # Troca atômica: conexões já abertas continuam lendo o arquivo antigo
+    os.replace(temp_path, snapshot_path)
+    return True
@@ -0,0 +1,94 @@
+"""
+Arquivamento de pedidos (hot/cold)
+
+Pedidos em status final e sem alterações há mais de ORDER_ARCHIVE_AGE_DAYS
+dias são movidos, em lotes, da tabela order para order_archive. Assim as
+consultas sobre pedidos ativos (sincronização, listas) percorrem uma
+tabela pequena; as leituras de pedidos antigos consultam o arquivo. As
+reposições (já finalizadas) dos pedidos arquivados vão junto para
+refill_archive, para que nenhuma reposição aponte para um pedido removido.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, literal, select
+from src.models.user import db, Order, OrderArchive, Refill, RefillArchive, TERMINAL_ORDER_STATUSES
+from src.services.batch_operations import TERMINAL_REFILL_STATUSES
+
+ARCHIVE_BATCH_SIZE = 500
+
+ARCHIVED_COLUMNS = [
+    'id', 'order_id_barato_sociais', 'user_id', 'service_id', 'link', 'quantity',
+    'price_paid', 'cost_to_us', 'status', 'start_count', 'remains', 'mp_preference_id',
+    'mp_payment_id', 'created_at', 'updated_at'
+]
+
+ARCHIVED_REFILL_COLUMNS = ['id', 'refill_id_barato_sociais', 'order_id', 'status', 'created_at', 'updated_at']
+
+def move_refills(condition):
+    """Copia para refill_archive e remove de refill as reposições que atendem à condição; não faz commit"""
+    db.session.execute(
+        insert(RefillArchive).from_select(
+            ARCHIVED_REFILL_COLUMNS + ['archived_at'],
+            select(
+                *[getattr(Refill, column) for column in ARCHIVED_REFILL_COLUMNS],
+                literal(datetime.utcnow())
+            ).where(condition)
+        )
+    )
+    db.session.execute(
+        delete(Refill).where(condition).execution_options(synchronize_session=False)
+    )
+
+def archive_orders(max_age_days, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move os pedidos finalizados antigos para order_archive; retorna quantos foram movidos
+
+    Cada lote (pedidos e suas reposições) é copiado e removido na mesma
+    transação. Pedidos com reposições em andamento ficam na tabela principal.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+    pending_refills = select(Refill.order_id).where(Refill.status.notin_(TERMINAL_REFILL_STATUSES))
+    archived_count = 0
+
+    while True:
+        order_ids = [
+            order_id for (order_id,) in db.session.query(Order.id).filter(
+                Order.status.in_(TERMINAL_ORDER_STATUSES),
+                Order.updated_at < cutoff,
+                Order.id.notin_(pending_refills)
+            ).order_by(Order.id).limit(batch_size)
+        ]
+        if not order_ids:
+            break
+
+        db.session.execute(
+            insert(OrderArchive).from_select(
+                ARCHIVED_COLUMNS + ['archived_at'],
+                select(
+                    *[getattr(Order, column) for column in ARCHIVED_COLUMNS],
+                    literal(datetime.utcnow())
+                ).where(Order.id.in_(order_ids))
+            )
+        )
+        move_refills(Refill.order_id.in_(order_ids))
+        db.session.execute(
+            delete(Order).where(Order.id.in_(order_ids)).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        archived_count += len(order_ids)
+
+    return archived_count
+
+def archive_orphan_refills():
+    """Move para refill_archive as reposições de pedidos já arquivados; não faz commit
+
+    Corrige bancos arquivados antes de refill_archive existir. Retorna
+    quantas reposições foram movidas.
+    """
+    condition = Refill.order_id.in_(select(OrderArchive.id))
+    count = db.session.query(func.count(Refill.id)).filter(condition).scalar()
+    if count:
+        move_refills(condition)
+    return count
+
+def get_order_or_archived(order_id):
+    """Busca um pedido na tabela principal e, se não existir, no arquivo"""
+    return Order.query.get(order_id) or OrderArchive.query.get(order_id)
@@ -1,6 +1,7 @@
 import requests
 import json
 from urllib.parse import urlencode
+from src.services.tracing import tracer
 
 class BaratoSociaisAPI:
     def __init__(self, api_key):
@@ -9,35 +10,40 @@ class BaratoSociaisAPI:
 
     def _make_request(self, data):
         """Faz uma requisição para a API do Barato Sociais"""
-        try:
-            # Adiciona a chave da API aos dados
-            data['key'] = self.api_key
-            
-            # Converte os dados para formato URL encoded
-            encoded_data = urlencode(data)
-            
-            headers = {
-                'Content-Type': 'application/x-www-form-urlencoded',
-                'User-Agent': 'Mozilla/4.0 (compatible; MSIE 5.01; Windows NT 5.0)'
-            }
-            
-            response = requests.post(
-                self.api_url,
-                data=encoded_data,
-                headers=headers,
-                verify=False,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return {'error': f'HTTP {response.status_code}: {response.text}'}
+        with tracer.span(f"barato_sociais.{data.get('action')}", kind='CLIENT') as span:
+            try:
+                # Adiciona a chave da API aos dados
+                data['key'] = self.api_key
                 
-        except requests.exceptions.RequestException as e:
-            return {'error': f'Request failed: {str(e)}'}
-        except json.JSONDecodeError as e:
-            return {'error': f'Invalid JSON response: {str(e)}'}
+                # Converte os dados para formato URL encoded
+                encoded_data = urlencode(data)
+                
+                headers = {
+                    'Content-Type': 'application/x-www-form-urlencoded',
+                    'User-Agent': 'Mozilla/4.0 (compatible; MSIE 5.01; Windows NT 5.0)',
+                    **tracer.outgoing_headers()
+                }
+                
+                response = requests.post(
+                    self.api_url,
+                    data=encoded_data,
+                    headers=headers,
+                    verify=False,
+                    timeout=30
+                )
+                
+                if span:
+                    span.set_tag('http.status_code', response.status_code)
+                
+                if response.status_code == 200:
+                    return response.json()
+                else:
+                    return {'error': f'HTTP {response.status_code}: {response.text}'}
+                    
+            except requests.exceptions.RequestException as e:
+                return {'error': f'Request failed: {str(e)}'}
+            except json.JSONDecodeError as e:
+                return {'error': f'Invalid JSON response: {str(e)}'}
 
     def get_services(self):
         """Obtém a lista de serviços disponíveis"""
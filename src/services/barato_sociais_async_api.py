@@ -0,0 +1,122 @@
+import asyncio
+import json
+from urllib.parse import urlencode
+
+import aiohttp
+
+from src.services.barato_sociais_api import BaratoSociaisAPI
+from src.services.tracing import tracer
+
+# Limites padrão para chamadas concorrentes ao Barato Sociais
+DEFAULT_CONCURRENCY = 20
+DEFAULT_POOL_SIZE = 100
+
+class AsyncBaratoSociaisAPI(BaratoSociaisAPI):
+    """Versão assíncrona do cliente do Barato Sociais.
+
+    Herda todas as ações de BaratoSociaisAPI (get_services, create_order,
+    get_order_status, refill_order, cancel_orders...). Como apenas
+    _make_request é sobrescrito, cada ação retorna uma corrotina com o
+    mesmo formato de resposta do cliente síncrono.
+
+    Todas as chamadas de uma instância compartilham o mesmo pool de
+    conexões. Use como gerenciador de contexto assíncrono ou chame close().
+    """
+
+    def __init__(self, api_key, concurrency=DEFAULT_CONCURRENCY, pool_size=DEFAULT_POOL_SIZE):
+        super().__init__(api_key)
+        self.concurrency = concurrency
+        self.pool_size = pool_size
+        self._session = None
+
+    async def __aenter__(self):
+        self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _get_session(self):
+        """Cria (uma única vez) a sessão HTTP com o pool de conexões compartilhado"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, ssl=False)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=30),
+                headers={
+                    'Content-Type': 'application/x-www-form-urlencoded',
+                    'User-Agent': 'Mozilla/4.0 (compatible; MSIE 5.01; Windows NT 5.0)'
+                }
+            )
+        return self._session
+
+    async def close(self):
+        """Fecha a sessão HTTP e libera as conexões do pool"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _make_request(self, data):
+        """Faz uma requisição assíncrona para a API do Barato Sociais"""
+        with tracer.span(f"barato_sociais.{data.get('action')}", kind='CLIENT') as span:
+            try:
+                # Adiciona a chave da API aos dados
+                data['key'] = self.api_key
+
+                session = self._get_session()
+                async with session.post(
+                    self.api_url, data=urlencode(data), headers=tracer.outgoing_headers()
+                ) as response:
+                    text = await response.text()
+                    if span:
+                        span.set_tag('http.status_code', response.status)
+
+                    if response.status == 200:
+                        return json.loads(text)
+                    else:
+                        return {'error': f'HTTP {response.status}: {text}'}
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                return {'error': f'Request failed: {str(e)}'}
+            except json.JSONDecodeError as e:
+                return {'error': f'Invalid JSON response: {str(e)}'}
+
+    async def gather(self, calls, concurrency=None):
+        """Executa várias chamadas em paralelo, limitadas por um semáforo.
+
+        `calls` é uma lista de funções sem argumentos que retornam corrotinas,
+        por exemplo: [lambda: api.get_order_status(1), lambda: api.refill_order(2)].
+        Os resultados são retornados na mesma ordem das chamadas; exceções
+        inesperadas são convertidas no formato {'error': ...} do cliente.
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.concurrency)
+
+        async def run(call):
+            async with semaphore:
+                try:
+                    return await call()
+                except Exception as e:
+                    return {'error': f'Request failed: {str(e)}'}
+
+        return await asyncio.gather(*(run(call) for call in calls))
+
+    async def get_orders_status_concurrently(self, order_ids, concurrency=None):
+        """Consulta o status de vários pedidos, um por chamada, em paralelo"""
+        results = await self.gather(
+            [lambda order_id=order_id: self.get_order_status(order_id) for order_id in order_ids],
+            concurrency
+        )
+        return dict(zip(order_ids, results))
+
+def run_concurrently(api_key, calls, concurrency=DEFAULT_CONCURRENCY):
+    """Executa chamadas ao Barato Sociais em paralelo a partir de código síncrono.
+
+    `calls` recebe a instância de AsyncBaratoSociaisAPI e retorna a lista de
+    chamadas a executar, por exemplo:
+        run_concurrently(key, lambda api: [lambda: api.refill_order(1)])
+    """
+    async def main():
+        async with AsyncBaratoSociaisAPI(api_key, concurrency=concurrency) as api:
+            return await api.gather(calls(api))
+
+    return asyncio.run(main())
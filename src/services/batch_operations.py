@@ -0,0 +1,130 @@
+"""
+Operações em lote no Barato Sociais: reposição, cancelamento e status de reposições
+
+Os ids são enviados em lotes (BATCH_SIZE por chamada) e os lotes são
+disparados em paralelo pelo cliente assíncrono.
+"""
+from src.models.user import db, Refill
+
+# Quantidade máxima de ids por chamada ao Barato Sociais
+BATCH_SIZE = 100
+
+# Status de reposição que não mudam mais
+TERMINAL_REFILL_STATUSES = ['Completed', 'Rejected', 'Canceled', 'Error']
+
+def chunked(items, size=BATCH_SIZE):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def _run_batches(api, method_name, ids):
+    """Chama um método em lote do cliente para cada fatia de ids, em paralelo
+
+    Retorna a lista com todos os itens de resposta e a lista de erros dos
+    lotes que falharam por inteiro.
+    """
+    from src.services.barato_sociais_async_api import run_concurrently
+
+    batches = chunked(ids)
+    responses = run_concurrently(
+        api.api_key,
+        lambda client: [
+            lambda batch=batch: getattr(client, method_name)(batch) for batch in batches
+        ]
+    )
+
+    items = []
+    errors = []
+    for batch, response in zip(batches, responses):
+        if isinstance(response, list):
+            items.extend(response)
+        else:
+            message = response.get('error', 'Unexpected response') if isinstance(response, dict) else 'Unexpected response'
+            errors.extend({'id': item_id, 'error': message} for item_id in batch)
+    return items, errors
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _item_error(value):
+    return value.get('error', 'Unknown error') if isinstance(value, dict) else None
+
+def request_refills(api, orders):
+    """Solicita reposição para vários pedidos e salva as reposições criadas; não faz commit"""
+    orders_by_upstream_id = {order.order_id_barato_sociais: order for order in orders}
+    items, errors = _run_batches(api, 'refill_multiple_orders', list(orders_by_upstream_id))
+
+    refills = []
+    failed = [{'order_id': orders_by_upstream_id[error['id']].id, 'error': error['error']} for error in errors]
+
+    for item in items:
+        order = orders_by_upstream_id.get(_to_int(item.get('order')))
+        if not order:
+            continue
+
+        refill_id = _to_int(item.get('refill'))
+        error = _item_error(item.get('refill'))
+        if error or refill_id is None:
+            failed.append({'order_id': order.id, 'error': error or 'Invalid refill response'})
+            continue
+
+        refill = Refill(
+            refill_id_barato_sociais=refill_id,
+            order_id=order.id,
+            status='Pending'
+        )
+        db.session.add(refill)
+        refills.append(refill)
+
+    return refills, failed
+
+def cancel_orders(api, orders):
+    """Solicita o cancelamento de vários pedidos; retorna (cancelados, falhas)"""
+    orders_by_upstream_id = {order.order_id_barato_sociais: order for order in orders}
+    items, errors = _run_batches(api, 'cancel_orders', list(orders_by_upstream_id))
+
+    canceled = []
+    failed = [{'order_id': orders_by_upstream_id[error['id']].id, 'error': error['error']} for error in errors]
+
+    for item in items:
+        order = orders_by_upstream_id.get(_to_int(item.get('order')))
+        if not order:
+            continue
+
+        error = _item_error(item.get('cancel'))
+        if error:
+            failed.append({'order_id': order.id, 'error': error})
+        else:
+            canceled.append(order.id)
+
+    return canceled, failed
+
+def sync_refill_statuses(api):
+    """Atualiza em lote o status de todas as reposições ainda em andamento; não faz commit"""
+    refills = Refill.query.filter(Refill.status.notin_(TERMINAL_REFILL_STATUSES)).all()
+    if not refills:
+        return 0, []
+
+    refills_by_upstream_id = {refill.refill_id_barato_sociais: refill for refill in refills}
+    items, errors = _run_batches(api, 'get_multiple_refill_status', list(refills_by_upstream_id))
+
+    updated_count = 0
+    failed = [{'refill_id': refills_by_upstream_id[error['id']].id, 'error': error['error']} for error in errors]
+
+    for item in items:
+        refill = refills_by_upstream_id.get(_to_int(item.get('refill')))
+        if not refill:
+            continue
+
+        status = item.get('status')
+        error = _item_error(status)
+        if error:
+            failed.append({'refill_id': refill.id, 'error': error})
+            continue
+
+        if status and status != refill.status:
+            refill.status = status
+            updated_count += 1
+
+    return updated_count, failed
@@ -0,0 +1,129 @@
+"""
+Cache em memória com TTL e coalescência de requisições concorrentes
+"""
+import threading
+import time
+from functools import wraps
+from flask import current_app, make_response, request
+
+class SingleFlight:
+    """Garante uma única execução simultânea por chave
+
+    Chamadas concorrentes com a mesma chave esperam a execução em andamento
+    e recebem o mesmo resultado (ou a mesma exceção).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'event': threading.Event(), 'result': None, 'error': None}
+                self._calls[key] = call
+
+        if not leader:
+            call['event'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = fn()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call['event'].set()
+
+class ResponseCache:
+    """Cache de valores com TTL que pode ser marcado como sujo a qualquer momento
+
+    invalidate() incrementa a versão do cache: entradas calculadas antes
+    disso deixam de ser servidas, mesmo que o TTL ainda não tenha expirado.
+    Misses concorrentes para a mesma chave executam um único recálculo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._version = 0
+        self._flight = SingleFlight()
+
+    def invalidate(self):
+        """Marca todas as entradas como sujas"""
+        with self._lock:
+            self._version += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._version += 1
+
+    def _get_fresh(self, key):
+        entry = self._entries.get(key)
+        if entry and entry['version'] == self._version and entry['expires_at'] > time.monotonic():
+            return entry
+        return None
+
+    def get_or_compute(self, key, compute, ttl, cache_if=None):
+        """Retorna o valor em cache ou o calcula (uma única vez por chave)"""
+        entry = self._get_fresh(key)
+        if entry:
+            return entry['value']
+
+        def load():
+            # Outra thread pode ter preenchido a entrada enquanto esperávamos
+            entry = self._get_fresh(key)
+            if entry:
+                return entry['value']
+
+            # A versão é lida antes do cálculo: uma invalidação durante o
+            # cálculo faz com que o resultado já nasça sujo
+            version = self._version
+            value = compute()
+
+            if cache_if is None or cache_if(value):
+                with self._lock:
+                    self._entries[key] = {
+                        'value': value,
+                        'version': version,
+                        'expires_at': time.monotonic() + ttl
+                    }
+            return value
+
+        return self._flight.do(key, load)
+
+def cached_response(cache, ttl_config_key):
+    """Decorator que guarda em cache respostas 200 de um endpoint GET
+
+    A chave é o caminho completo da requisição (incluindo a query string) e
+    o TTL, em segundos, é lido de app.config[ttl_config_key]. Um TTL <= 0
+    desativa o cache.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            ttl = current_app.config.get(ttl_config_key, 0)
+            if ttl <= 0:
+                return f(*args, **kwargs)
+
+            def compute():
+                response = make_response(f(*args, **kwargs))
+                return response.status_code, response.get_data(), response.mimetype
+
+            status, body, mimetype = cache.get_or_compute(
+                request.full_path,
+                compute,
+                ttl,
+                cache_if=lambda value: value[0] == 200
+            )
+            return current_app.response_class(body, status=status, mimetype=mimetype)
+        return decorated_function
+    return decorator
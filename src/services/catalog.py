@@ -0,0 +1,132 @@
+"""
+Estado do catálogo de serviços: versão, snapshots e contagens em memória
+"""
+import hashlib
+import json
+import threading
+import uuid
+import zlib
+from sqlalchemy import func
+from src.models.user import db, CatalogSnapshot, Service, Setting
+
+CATALOG_VERSION_KEY = 'catalog_version'
+
+# Quantidade de snapshots do catálogo mantidos no banco
+SNAPSHOT_RETENTION = 30
+
+def get_catalog_version():
+    """Lê a versão atual do catálogo (consulta pelo índice único de Setting.key)"""
+    return db.session.query(Setting.value).filter(Setting.key == CATALOG_VERSION_KEY).scalar()
+
+def bump_catalog_version():
+    """Gera uma nova versão do catálogo; não faz commit"""
+    version = uuid.uuid4().hex
+    setting = Setting.query.filter_by(key=CATALOG_VERSION_KEY).first()
+    if setting:
+        setting.value = version
+    else:
+        db.session.add(Setting(key=CATALOG_VERSION_KEY, value=version))
+    return version
+
+def content_hash(data):
+    """Hash SHA-256 de uma estrutura JSON, independente da ordem das chaves"""
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def get_latest_snapshot():
+    return CatalogSnapshot.query.order_by(CatalogSnapshot.id.desc()).first()
+
+def store_snapshot(services_data, catalog_hash):
+    """Salva o catálogo bruto compactado e remove os snapshots mais antigos; não faz commit"""
+    payload = json.dumps(services_data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    snapshot = CatalogSnapshot(
+        content_hash=catalog_hash,
+        payload=zlib.compress(payload, 9),
+        service_count=len(services_data)
+    )
+    db.session.add(snapshot)
+    db.session.flush()
+
+    old_ids = [
+        snapshot_id for (snapshot_id,) in db.session.query(CatalogSnapshot.id).order_by(
+            CatalogSnapshot.id.desc()
+        ).offset(SNAPSHOT_RETENTION)
+    ]
+    if old_ids:
+        CatalogSnapshot.query.filter(CatalogSnapshot.id.in_(old_ids)).delete(synchronize_session=False)
+
+    return snapshot
+
+def _rate(service_data):
+    try:
+        return float(service_data.get('rate', 0))
+    except (TypeError, ValueError):
+        return None
+
+def diff_snapshots(previous, current):
+    """Compara dois snapshots: mudanças de preço, serviços adicionados e removidos"""
+    previous_services = {item.get('service'): item for item in previous.get_services()} if previous else {}
+    current_services = {item.get('service'): item for item in current.get_services()}
+
+    price_changes = []
+    for service_id, item in current_services.items():
+        old_item = previous_services.get(service_id)
+        if old_item is None:
+            continue
+        old_rate, new_rate = _rate(old_item), _rate(item)
+        if old_rate != new_rate:
+            price_changes.append({
+                'service': service_id,
+                'name': item.get('name'),
+                'category': item.get('category'),
+                'old_rate': old_rate,
+                'new_rate': new_rate
+            })
+
+    added = [
+        {'service': service_id, 'name': item.get('name'), 'rate': _rate(item)}
+        for service_id, item in current_services.items() if service_id not in previous_services
+    ]
+    removed = [
+        {'service': service_id, 'name': item.get('name'), 'rate': _rate(item)}
+        for service_id, item in previous_services.items() if service_id not in current_services
+    ]
+
+    return {'price_changes': price_changes, 'added': added, 'removed': removed}
+
+class CategoryCounts:
+    """Contagem de serviços por categoria, mantida em memória
+
+    A contagem só é recalculada quando a versão do catálogo muda (após uma
+    sincronização, em qualquer processo); nas demais chamadas a navegação
+    por categorias não consulta a tabela de serviços.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = None
+        self._version = None
+
+    def get(self):
+        version = get_catalog_version()
+        with self._lock:
+            if self._counts is not None and self._version == version:
+                return self._counts
+        return self.refresh(version)
+
+    def refresh(self, version=None):
+        rows = db.session.query(
+            Service.category,
+            func.count(Service.id)
+        ).filter(
+            Service.category.isnot(None),
+            Service.category != ''
+        ).group_by(Service.category).order_by(Service.category).all()
+
+        counts = {category: count for category, count in rows}
+        with self._lock:
+            self._counts = counts
+            self._version = version if version is not None else get_catalog_version()
+        return counts
+
+category_counts = CategoryCounts()
@@ -0,0 +1,43 @@
+"""
+GET condicional (ETag / Last-Modified) para os endpoints de pedidos
+
+Os validadores são calculados a partir de updated_at (e, nas listas, da
+quantidade de pedidos) com consultas que usam apenas índices. Quando o
+cliente já tem a versão atual, a resposta 304 sai antes de qualquer
+serialização (to_dict) ou chamada ao Barato Sociais.
+"""
+import hashlib
+from datetime import timezone
+from flask import Response, request
+
+def make_etag(*parts):
+    """ETag forte a partir dos valores que identificam a versão da resposta"""
+    text = '|'.join('' if part is None else str(part) for part in parts)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def http_datetime(value):
+    """Converte um datetime UTC sem timezone para o Last-Modified (precisão de segundos)"""
+    if value is None:
+        return None
+    return value.replace(microsecond=0, tzinfo=timezone.utc)
+
+def is_not_modified(etag, last_modified=None):
+    """Indica se o cliente já tem esta versão (If-None-Match tem precedência)"""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified is not None:
+        return http_datetime(last_modified) <= request.if_modified_since
+    return False
+
+def set_validators(response, etag, last_modified=None):
+    """Adiciona ETag e Last-Modified a uma resposta"""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = http_datetime(last_modified)
+    # O conteúdo depende do usuário logado: o navegador deve revalidar a cada uso
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def not_modified(etag, last_modified=None):
+    """Resposta 304 sem corpo, com os mesmos validadores"""
+    return set_validators(Response(status=304), etag, last_modified)
@@ -0,0 +1,91 @@
+"""
+Saúde das APIs externas (Barato Sociais e Mercado Pago)
+
+O job check_provider_health consulta cada API com chamadas somente
+leitura (saldo no Barato Sociais, dados da conta no Mercado Pago) e grava
+status, latência e saldo na tabela provider_health. A tela de
+configurações lê esse resultado sem chamar as APIs.
+"""
+import time
+from datetime import datetime
+from sqlalchemy.dialects.sqlite import insert
+from src.models.user import db, ProviderHealth
+from src.services.settings_cache import settings_cache
+
+PROVIDERS = ['barato_sociais', 'mercado_pago']
+
+def _timed(call):
+    started_at = time.perf_counter()
+    response = call()
+    return response, round((time.perf_counter() - started_at) * 1000, 1)
+
+def check_barato_sociais():
+    from src.services.barato_sociais_api import BaratoSociaisAPI
+
+    api_key = settings_cache.get('barato_sociais_api_key')
+    if not api_key:
+        return {'status': 'not_configured', 'message': 'API key not set'}
+
+    response, latency_ms = _timed(BaratoSociaisAPI(api_key).get_balance)
+    if 'error' in response:
+        return {'status': 'error', 'message': response['error'], 'latency_ms': latency_ms}
+    return {
+        'status': 'success',
+        'message': 'API configured correctly',
+        'latency_ms': latency_ms,
+        'balance': str(response.get('balance', 'N/A')),
+        'currency': response.get('currency', 'N/A')
+    }
+
+def check_mercado_pago():
+    from src.services.mercado_pago_api import MercadoPagoAPI
+
+    access_token = settings_cache.get('mp_access_token')
+    if not access_token:
+        return {'status': 'not_configured', 'message': 'Access token not set'}
+
+    response, latency_ms = _timed(MercadoPagoAPI(access_token).get_account_info)
+    if 'error' in response:
+        return {'status': 'error', 'message': response['error'], 'latency_ms': latency_ms}
+    return {'status': 'success', 'message': 'API configured correctly', 'latency_ms': latency_ms}
+
+CHECKS = {
+    'barato_sociais': check_barato_sociais,
+    'mercado_pago': check_mercado_pago
+}
+
+def refresh_provider_health():
+    """Verifica todas as APIs e grava o resultado; não faz commit"""
+    results = {}
+    for provider in PROVIDERS:
+        try:
+            result = CHECKS[provider]()
+        except Exception as e:
+            result = {'status': 'error', 'message': str(e)}
+        results[provider] = result
+
+    rows = [
+        {
+            'provider': provider,
+            'status': result['status'],
+            'message': result.get('message'),
+            'latency_ms': result.get('latency_ms'),
+            'balance': result.get('balance'),
+            'currency': result.get('currency'),
+            'checked_at': datetime.utcnow()
+        }
+        for provider, result in results.items()
+    ]
+    statement = insert(ProviderHealth).values(rows)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['provider'],
+        set_={column: statement.excluded[column] for column in rows[0] if column != 'provider'}
+    ))
+    db.session.expire_all()
+
+def get_provider_health():
+    """Último resultado gravado de cada API (None para as que nunca foram verificadas)"""
+    health = {provider: None for provider in PROVIDERS}
+    for row in ProviderHealth.query.filter(ProviderHealth.provider.in_(PROVIDERS)):
+        health[row.provider] = row.to_dict()
+    return health
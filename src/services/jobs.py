@@ -0,0 +1,92 @@
+"""
+Jobs periódicos da aplicação
+
+Os intervalos (em segundos) vêm de app.config; um intervalo <= 0 desativa
+o job. Cada job roda em apenas um processo por vez (ver scheduler.py).
+"""
+from src.models.user import db
+from src.services.scheduler import scheduler
+
+@scheduler.register('sync_orders_status', 'ORDER_SYNC_INTERVAL')
+def sync_orders_status_job():
+    """Sincroniza o status dos pedidos ativos com o Barato Sociais"""
+    from src.routes.orders import get_barato_sociais_api, sync_active_orders
+
+    api = get_barato_sociais_api()
+    if not api:
+        return
+
+    result = sync_active_orders(api)
+    if result['error']:
+        db.session.rollback()
+        print(f"✗ Erro ao sincronizar pedidos: {result['error']}")
+        return
+
+    db.session.commit()
+
+@scheduler.register('sync_refills_status', 'REFILL_SYNC_INTERVAL')
+def sync_refills_status_job():
+    """Sincroniza o status das reposições em andamento"""
+    from src.routes.orders import get_barato_sociais_api
+    from src.services.batch_operations import sync_refill_statuses
+
+    api = get_barato_sociais_api()
+    if not api:
+        return
+
+    sync_refill_statuses(api)
+    db.session.commit()
+
+@scheduler.register('refresh_analytics_snapshot', 'ANALYTICS_SNAPSHOT_INTERVAL')
+def refresh_analytics_snapshot_job():
+    """Atualiza a cópia do banco usada pelas consultas do dashboard"""
+    from src.services.analytics_db import refresh_snapshot
+
+    refresh_snapshot()
+
+@scheduler.register('archive_orders', 'ORDER_ARCHIVE_INTERVAL')
+def archive_orders_job():
+    """Move pedidos finalizados antigos para a tabela de arquivo"""
+    from flask import current_app
+    from src.services.archive import archive_orders
+
+    archive_orders(current_app.config['ORDER_ARCHIVE_AGE_DAYS'])
+
+@scheduler.register('deliver_outbox', 'OUTBOX_INTERVAL')
+def deliver_outbox_job():
+    """Tenta novamente os envios ao Barato Sociais que falharam"""
+    from src.routes.orders import get_barato_sociais_api
+    from src.services.outbox import deliver_pending_messages
+
+    api = get_barato_sociais_api()
+    if not api:
+        return
+
+    deliver_pending_messages(api)
+
+@scheduler.register('reconcile_payments', 'PAYMENT_RECONCILE_INTERVAL')
+def reconcile_payments_job():
+    """Recupera pagamentos cujos webhooks do Mercado Pago foram perdidos"""
+    from flask import current_app
+    from src.routes.orders import get_mercado_pago_api
+    from src.services.payments import reconcile_payments
+
+    api = get_mercado_pago_api()
+    if not api:
+        return
+
+    result = reconcile_payments(api, current_app.config['PAYMENT_RECONCILE_WINDOW_HOURS'])
+    if result['error']:
+        db.session.rollback()
+        print(f"✗ Erro ao conciliar pagamentos: {result['error']}")
+        return
+
+    db.session.commit()
+
+@scheduler.register('check_provider_health', 'HEALTH_CHECK_INTERVAL')
+def check_provider_health_job():
+    """Atualiza o status, a latência e o saldo das APIs externas"""
+    from src.services.health import refresh_provider_health
+
+    refresh_provider_health()
+    db.session.commit()
@@ -0,0 +1,53 @@
+"""
+Respostas JSON geradas aos poucos, para listas grandes
+
+Em vez de montar a lista inteira de dicionários antes de serializar, os
+itens são lidos do banco em lotes (yield_per) e escritos na resposta à
+medida que chegam. O uso de memória fica limitado ao lote atual e o
+primeiro byte sai antes do fim da consulta.
+
+Depois que o envio começa não é mais possível responder com um status de
+erro: uma falha no meio da consulta interrompe a resposta.
+"""
+import json
+from itertools import islice
+from flask import Response, current_app, stream_with_context
+
+# Linhas lidas do banco por lote
+STREAM_BATCH_SIZE = 500
+
+# Itens serializados acumulados antes de cada escrita na resposta
+ITEMS_PER_CHUNK = 100
+
+def batched(iterable, size=STREAM_BATCH_SIZE):
+    """Agrupa um iterável em listas de até `size` itens"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def iter_json_object(key, items, extra=None):
+    """Gera o texto de {"<key>": [itens...], ...extra} em pedaços"""
+    dumps = current_app.json.dumps
+    yield '{' + json.dumps(key) + ':['
+
+    first = True
+    for chunk in batched(items, ITEMS_PER_CHUNK):
+        text = ','.join(dumps(item) for item in chunk)
+        yield text if first else ',' + text
+        first = False
+
+    yield ']'
+    for extra_key, value in (extra or {}).items():
+        yield ',' + json.dumps(extra_key) + ':' + dumps(value)
+    yield '}'
+
+def stream_json_list(key, items, extra=None, status=200):
+    """Resposta JSON em streaming; `items` é um iterável (normalmente um gerador)"""
+    return Response(
+        stream_with_context(iter_json_object(key, items, extra)),
+        status=status,
+        mimetype='application/json'
+    )
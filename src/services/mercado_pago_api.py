@@ -1,6 +1,10 @@
 import requests
 import json
 from datetime import datetime, timedelta
+from src.services.tracing import tracer
+
+# Tempo máximo (segundos) de espera por uma resposta da API
+REQUEST_TIMEOUT = 30
 
 class MercadoPagoAPI:
     def __init__(self, access_token):
@@ -48,7 +52,10 @@ class MercadoPagoAPI:
             data["external_reference"] = str(external_reference)
         
         try:
-            response = requests.post(url, headers=headers, json=data)
+            with tracer.span('mercado_pago.create_payment_preference', kind='CLIENT') as span:
+                response = requests.post(url, headers={**headers, **tracer.outgoing_headers()}, json=data, timeout=REQUEST_TIMEOUT)
+                if span:
+                    span.set_tag('http.status_code', response.status_code)
             
             if response.status_code == 201:
                 return response.json()
@@ -68,7 +75,10 @@ class MercadoPagoAPI:
         }
         
         try:
-            response = requests.get(url, headers=headers)
+            with tracer.span('mercado_pago.get_payment_info', kind='CLIENT') as span:
+                response = requests.get(url, headers={**headers, **tracer.outgoing_headers()}, timeout=REQUEST_TIMEOUT)
+                if span:
+                    span.set_tag('http.status_code', response.status_code)
             
             if response.status_code == 200:
                 return response.json()
@@ -88,7 +98,68 @@ class MercadoPagoAPI:
         }
         
         try:
-            response = requests.get(url, headers=headers)
+            with tracer.span('mercado_pago.get_preference_info', kind='CLIENT') as span:
+                response = requests.get(url, headers={**headers, **tracer.outgoing_headers()}, timeout=REQUEST_TIMEOUT)
+                if span:
+                    span.set_tag('http.status_code', response.status_code)
+            
+            if response.status_code == 200:
+                return response.json()
+            else:
+                return {'error': f'HTTP {response.status_code}: {response.text}'}
+                
+        except requests.exceptions.RequestException as e:
+            return {'error': f'Request failed: {str(e)}'}
+
+    def get_account_info(self):
+        """Obtém os dados da conta dona do access token (chamada somente leitura)"""
+        url = f"{self.base_url}/users/me"
+        
+        headers = {
+            'Authorization': f'Bearer {self.access_token}',
+            'Content-Type': 'application/json'
+        }
+        
+        try:
+            with tracer.span('mercado_pago.get_account_info', kind='CLIENT') as span:
+                response = requests.get(url, headers={**headers, **tracer.outgoing_headers()}, timeout=10)
+                if span:
+                    span.set_tag('http.status_code', response.status_code)
+            
+            if response.status_code == 200:
+                return response.json()
+            else:
+                return {'error': f'HTTP {response.status_code}: {response.text}'}
+                
+        except requests.exceptions.RequestException as e:
+            return {'error': f'Request failed: {str(e)}'}
+
+    def search_payments(self, begin_date, end_date, offset=0, limit=100, external_reference=None):
+        """Busca pagamentos criados em um período (uma página dos resultados)"""
+        url = f"{self.base_url}/v1/payments/search"
+        
+        headers = {
+            'Authorization': f'Bearer {self.access_token}',
+            'Content-Type': 'application/json'
+        }
+        
+        params = {
+            'sort': 'date_created',
+            'criteria': 'asc',
+            'range': 'date_created',
+            'begin_date': begin_date.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'end_date': end_date.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'offset': offset,
+            'limit': limit
+        }
+        if external_reference:
+            params['external_reference'] = str(external_reference)
+        
+        try:
+            with tracer.span('mercado_pago.search_payments', kind='CLIENT') as span:
+                response = requests.get(url, headers={**headers, **tracer.outgoing_headers()}, params=params, timeout=REQUEST_TIMEOUT)
+                if span:
+                    span.set_tag('http.status_code', response.status_code)
             
             if response.status_code == 200:
                 return response.json()
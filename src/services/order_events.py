@@ -0,0 +1,77 @@
+"""
+Eventos de alteração de pedidos
+
+Observa os flushes da sessão do SQLAlchemy e, após o commit, avisa os
+listeners registrados sobre pedidos criados ou com status/progresso
+alterado. Assim os caminhos que escrevem pedidos (criação, webhook,
+processamento e sincronização) não precisam chamar cada interessado.
+"""
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from src.models.user import Order
+
+TRACKED_FIELDS = ('status', 'start_count', 'remains')
+
+_listeners = []
+
+def on_order_change(listener):
+    """Registra uma função chamada com a lista de alterações após cada commit"""
+    _listeners.append(listener)
+    return listener
+
+def _previous_value(order, field):
+    history = inspect(order).attrs[field].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(order, field)
+
+def _snapshot(order, created):
+    return {
+        'id': order.id,
+        'user_id': order.user_id,
+        'status': order.status,
+        'previous_status': None if created else _previous_value(order, 'status'),
+        'start_count': order.start_count,
+        'remains': order.remains,
+        'updated_at': order.updated_at,
+        'created': created
+    }
+
+@event.listens_for(Session, 'after_flush')
+def _collect_order_changes(session, flush_context):
+    # Em after_flush, session.new/dirty e o histórico ainda refletem o estado pré-flush
+    changes = session.info.setdefault('order_changes', {})
+
+    for obj in session.new:
+        if isinstance(obj, Order):
+            changes[obj.id] = _snapshot(obj, created=True)
+
+    for obj in session.dirty:
+        if not isinstance(obj, Order):
+            continue
+        state = inspect(obj)
+        if any(state.attrs[field].history.has_changes() for field in TRACKED_FIELDS):
+            snapshot = _snapshot(obj, created=False)
+            previous = changes.get(obj.id)
+            if previous:
+                # Vários flushes na mesma transação: mantém o status original
+                snapshot['previous_status'] = previous['previous_status']
+                snapshot['created'] = previous['created']
+            changes[obj.id] = snapshot
+
+@event.listens_for(Session, 'after_commit')
+def _dispatch_order_changes(session):
+    changes = session.info.pop('order_changes', None)
+    if not changes:
+        return
+
+    changes = list(changes.values())
+    for listener in _listeners:
+        try:
+            listener(changes)
+        except Exception as e:
+            print(f"✗ Erro ao notificar alteração de pedidos: {str(e)}")
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_order_changes(session):
+    session.info.pop('order_changes', None)
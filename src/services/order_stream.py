@@ -0,0 +1,128 @@
+"""
+Stream de atualizações de pedidos via Server-Sent Events (SSE)
+
+Cada conexão aberta acompanha os pedidos de um usuário. Alterações feitas
+neste processo acordam a conexão imediatamente (via order_events); as
+feitas por outros workers são encontradas por uma consulta periódica e
+barata ao banco (índice user_id + updated_at).
+
+Cada conexão ocupa uma thread enquanto estiver aberta: com gunicorn, use
+workers com threads (--worker-class gthread --threads N).
+"""
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from src.models.user import db, Order
+from src.services.order_events import on_order_change
+
+# Intervalo máximo (segundos) entre consultas ao banco
+POLL_INTERVAL = 5
+
+# Intervalo (segundos) entre comentários de keep-alive
+HEARTBEAT_INTERVAL = 15
+
+# Duração máxima de uma conexão; o navegador reconecta sozinho com Last-Event-ID
+MAX_STREAM_DURATION = 300
+
+# Margem para alterações gravadas por outros processos com relógio levemente atrasado
+CURSOR_OVERLAP = timedelta(seconds=2)
+
+class OrderEventBroker:
+    """Acorda as conexões SSE deste processo quando pedidos dos seus usuários mudam"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, user_id):
+        wakeup = queue.Queue(maxsize=1)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(wakeup)
+        return wakeup
+
+    def unsubscribe(self, user_id, wakeup):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers:
+                subscribers.discard(wakeup)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def publish(self, changes):
+        user_ids = {change['user_id'] for change in changes}
+        with self._lock:
+            targets = [wakeup for user_id in user_ids for wakeup in self._subscribers.get(user_id, ())]
+
+        for wakeup in targets:
+            try:
+                wakeup.put_nowait(True)
+            except queue.Full:
+                # Já existe um aviso pendente para esta conexão
+                pass
+
+order_broker = OrderEventBroker()
+on_order_change(order_broker.publish)
+
+def _format_event(order_id, status, start_count, remains, updated_at):
+    data = {
+        'id': order_id,
+        'status': status,
+        'start_count': start_count,
+        'remains': remains,
+        'updated_at': updated_at.isoformat() if updated_at else None
+    }
+    event_id = updated_at.isoformat() if updated_at else ''
+    return f"id: {event_id}\nevent: order\ndata: {json.dumps(data)}\n\n"
+
+def parse_last_event_id(value):
+    """Converte o Last-Event-ID (updated_at ISO) no cursor inicial do stream"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+def stream_order_updates(user_id, since=None):
+    """Gerador de eventos SSE com as alterações dos pedidos de um usuário"""
+    wakeup = order_broker.subscribe(user_id)
+    try:
+        cursor = since or datetime.utcnow()
+        sent = {}
+        started_at = last_heartbeat = time.monotonic()
+
+        yield f"retry: {POLL_INTERVAL * 1000}\n\n"
+
+        while time.monotonic() - started_at < MAX_STREAM_DURATION:
+            rows = db.session.query(
+                Order.id, Order.status, Order.start_count, Order.remains, Order.updated_at
+            ).filter(
+                Order.user_id == user_id,
+                Order.updated_at >= cursor - CURSOR_OVERLAP
+            ).order_by(Order.updated_at).all()
+
+            # Encerra a transação de leitura para não segurar o banco entre consultas
+            db.session.rollback()
+
+            for order_id, status, start_count, remains, updated_at in rows:
+                state = (status, start_count, remains)
+                if sent.get(order_id) == state:
+                    continue
+                sent[order_id] = state
+                if updated_at and updated_at > cursor:
+                    cursor = updated_at
+                last_heartbeat = time.monotonic()
+                yield _format_event(order_id, status, start_count, remains, updated_at)
+
+            if time.monotonic() - last_heartbeat >= HEARTBEAT_INTERVAL:
+                last_heartbeat = time.monotonic()
+                yield ": keep-alive\n\n"
+
+            try:
+                wakeup.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                pass
+    finally:
+        order_broker.unsubscribe(user_id, wakeup)
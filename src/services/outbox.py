@@ -0,0 +1,172 @@
+"""
+Outbox de envios ao Barato Sociais, com novas tentativas e backoff
+
+Ao processar um pedido, a mensagem de envio é gravada na mesma transação
+que muda o status do pedido para 'Submitting'. A entrega é tentada logo em
+seguida; se o Barato Sociais falhar, o job deliver_outbox tenta de novo com
+backoff exponencial e jitter. Depois de OUTBOX_MAX_ATTEMPTS tentativas a
+mensagem vai para 'dead' e o pedido volta a 'Paid', para ser reenviado
+pelo admin (replay).
+
+Antes de cada tentativa a mensagem é reservada com um UPDATE condicional,
+para que a entrega imediata e o job (ou dois processos) não enviem o mesmo
+pedido ao mesmo tempo.
+"""
+import json
+import random
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update
+from src.models.user import db, OutboxMessage
+
+SUBMIT_ORDER = 'submit_order'
+
+# Tempo (segundos) durante o qual uma tentativa em andamento fica reservada
+CLAIM_TIMEOUT = 120
+
+def enqueue_order_submission(order):
+    """Grava o envio do pedido na outbox e marca o pedido como 'Submitting'; não faz commit
+
+    A mensagem já nasce reservada para a entrega imediata feita pelo chamador.
+    """
+    message = OutboxMessage(
+        order_id=order.id,
+        kind=SUBMIT_ORDER,
+        payload=json.dumps({
+            'service_id': order.service.service_id_barato_sociais,
+            'link': order.link,
+            'quantity': order.quantity
+        }),
+        status='pending',
+        attempts=0,
+        next_attempt_at=datetime.utcnow() + timedelta(seconds=CLAIM_TIMEOUT)
+    )
+    db.session.add(message)
+
+    order.status = 'Submitting'
+    order.updated_at = datetime.utcnow()
+    return message
+
+def claim_message(message_id):
+    """Reserva uma mensagem pendente que já pode ser tentada; retorna True se conseguiu"""
+    now = datetime.utcnow()
+    claimed = db.session.execute(
+        update(OutboxMessage).where(
+            OutboxMessage.id == message_id,
+            OutboxMessage.status == 'pending',
+            OutboxMessage.next_attempt_at <= now
+        ).values(next_attempt_at=now + timedelta(seconds=CLAIM_TIMEOUT))
+    ).rowcount
+    db.session.commit()
+    return claimed == 1
+
+def retry_delay(attempts):
+    """Backoff exponencial com jitter: metade fixa e metade aleatória do atraso"""
+    base = current_app.config['OUTBOX_RETRY_BASE']
+    delay = min(base * 2 ** (attempts - 1), current_app.config['OUTBOX_RETRY_MAX'])
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def deliver_message(api, message):
+    """Executa uma tentativa de entrega de uma mensagem já reservada; não faz commit
+
+    Retorna a resposta do Barato Sociais.
+    """
+    order = message.order
+    payload = message.get_payload()
+    message.attempts += 1
+
+    response = api.create_order(
+        service_id=payload['service_id'],
+        link=payload['link'],
+        quantity=payload['quantity']
+    )
+    error = response.get('error') if isinstance(response, dict) else 'Unexpected response'
+    if not error and not response.get('order'):
+        error = 'Order id missing from response'
+
+    if not error:
+        message.status = 'delivered'
+        message.delivered_at = datetime.utcnow()
+        message.last_error = None
+        order.order_id_barato_sociais = response.get('order')
+        order.status = 'Processing'
+        order.updated_at = datetime.utcnow()
+        return response
+
+    message.last_error = str(error)
+    if message.attempts >= current_app.config['OUTBOX_MAX_ATTEMPTS']:
+        message.status = 'dead'
+        # Pedido volta a 'Paid' para ficar visível como pendente de envio
+        order.status = 'Paid'
+        order.updated_at = datetime.utcnow()
+    else:
+        message.next_attempt_at = datetime.utcnow() + timedelta(seconds=retry_delay(message.attempts))
+    return response
+
+def deliver_pending_messages(api, limit=100):
+    """Tenta entregar as mensagens pendentes cujo horário de nova tentativa já chegou
+
+    Cada mensagem é reservada, entregue e confirmada (commit) separadamente.
+    Retorna a quantidade de entregues e de falhas.
+    """
+    due_ids = [
+        message_id for (message_id,) in db.session.query(OutboxMessage.id).filter(
+            OutboxMessage.status == 'pending',
+            OutboxMessage.next_attempt_at <= datetime.utcnow()
+        ).order_by(OutboxMessage.next_attempt_at).limit(limit)
+    ]
+
+    delivered = failed = 0
+    for message_id in due_ids:
+        if not claim_message(message_id):
+            continue
+
+        message = OutboxMessage.query.get(message_id)
+        try:
+            deliver_message(api, message)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Erro ao entregar mensagem {message_id} da outbox: {str(e)}")
+            failed += 1
+            continue
+
+        if message.status == 'delivered':
+            delivered += 1
+        else:
+            failed += 1
+
+    return delivered, failed
+
+def replay_message(message):
+    """Recoloca uma mensagem 'dead' na fila para entrega imediata; não faz commit
+
+    Levanta LookupError se o pedido não existe mais (ex.: arquivado) e
+    ValueError se o reenvio puder duplicar o pedido no Barato Sociais: a
+    mensagem não está 'dead', o pedido já tem id no Barato Sociais ou outra
+    mensagem do pedido ainda está pendente ou foi entregue.
+    """
+    if message.status != 'dead':
+        raise ValueError(f'Only dead messages can be replayed (status: {message.status})')
+
+    order = message.order
+    if order is None:
+        raise LookupError('Order not found')
+    if order.order_id_barato_sociais:
+        raise ValueError('Order already submitted to Barato Sociais')
+
+    other_active = OutboxMessage.query.filter(
+        OutboxMessage.order_id == order.id,
+        OutboxMessage.id != message.id,
+        OutboxMessage.status != 'dead'
+    ).first()
+    if other_active:
+        raise ValueError(f'Order has another {other_active.status} message ({other_active.id})')
+
+    message.status = 'pending'
+    message.attempts = 0
+    message.next_attempt_at = datetime.utcnow()
+
+    if order.status == 'Paid':
+        order.status = 'Submitting'
+        order.updated_at = datetime.utcnow()
@@ -0,0 +1,150 @@
+"""
+Pagamentos do Mercado Pago: status dos pedidos e conciliação
+
+O webhook e a conciliação usam o mesmo mapeamento de status. A conciliação
+recupera webhooks perdidos: busca, em páginas, os pagamentos criados no
+período dos pedidos que ainda aguardam pagamento e atualiza todos eles em
+uma única transação.
+
+Um pagamento nunca faz o pedido voltar atrás: depois de enviado ao Barato
+Sociais ('Submitting', 'Processing', ...) ou finalizado, o status do pedido
+não é mais alterado pelo pagamento, e um pedido 'Paid' só pode passar a
+'Refunded'. Os pedidos são relidos dentro da transação de escrita, pois a
+busca no Mercado Pago pode levar segundos.
+"""
+from datetime import datetime, timedelta
+from src.models.user import db, Order
+
+PAYMENT_STATUS_MAP = {
+    'approved': 'Paid',
+    'rejected': 'Payment Rejected',
+    'cancelled': 'Payment Cancelled',
+    'pending': 'Pending Payment',
+    'in_process': 'Payment Processing',
+    'refunded': 'Refunded'
+}
+
+# Pedidos que ainda aguardam a confirmação do pagamento
+AWAITING_PAYMENT_STATUSES = ['Pending Payment', 'Payment Processing']
+
+# Status que ainda podem ser alterados por um pagamento (o pedido não foi enviado)
+PAYMENT_STAGE_STATUSES = AWAITING_PAYMENT_STATUSES + ['Pending', 'Payment Rejected', 'Payment Cancelled']
+
+# Pagamentos por página na busca do Mercado Pago
+SEARCH_PAGE_SIZE = 100
+
+# Prioridade de cada status quando um pedido tem vários pagamentos
+PAYMENT_PRIORITY = {'approved': 3, 'refunded': 2, 'in_process': 1, 'pending': 1}
+
+def order_status_for_payment(payment_status):
+    """Status do pedido correspondente ao status de um pagamento"""
+    return PAYMENT_STATUS_MAP.get(payment_status, f'Payment {payment_status}')
+
+def can_apply_payment_status(current_status, new_status):
+    """Indica se um pagamento pode mudar o pedido de current_status para new_status"""
+    if current_status == new_status:
+        return True
+    if current_status == 'Paid':
+        return new_status == 'Refunded'
+    return current_status in PAYMENT_STAGE_STATUSES or current_status.startswith('Payment ')
+
+def begin_write(session):
+    """No SQLite, abre a transação de escrita (BEGIN IMMEDIATE) se ainda não houver uma
+
+    Os pedidos relidos em seguida não podem mais ser alterados por outro
+    processo até o commit.
+    """
+    connection = session.connection()
+    if connection.dialect.name == 'sqlite' and not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+def apply_payment(order, payment_info):
+    """Atualiza o pedido com os dados de um pagamento; não faz commit
+
+    Retorna True se o status ou o pagamento do pedido mudaram. Pagamentos
+    que fariam o pedido voltar atrás são ignorados (retorna False).
+    """
+    status = order_status_for_payment(payment_info.get('status'))
+    if not can_apply_payment_status(order.status, status):
+        return False
+
+    payment_id = str(payment_info['id']) if payment_info.get('id') else order.mp_payment_id
+    changed = status != order.status or payment_id != order.mp_payment_id
+    if changed:
+        order.status = status
+        order.mp_payment_id = payment_id
+        order.updated_at = datetime.utcnow()
+    return changed
+
+def apply_payment_to_order(order_id, payment_info):
+    """Aplica um pagamento ao pedido pelo id (função usada pela fila de escritas)
+
+    Retorna {'order_id', 'status'} ou None se o pedido não existir.
+    """
+    begin_write(db.session)
+    order = db.session.get(Order, order_id, populate_existing=True)
+    if not order:
+        return None
+    apply_payment(order, payment_info)
+    db.session.flush()
+    return {'order_id': order.id, 'status': order.status}
+
+def reconcile_payments(api, window_hours):
+    """Concilia os pedidos aguardando pagamento criados nas últimas window_hours horas; não faz commit
+
+    Retorna um dicionário com a quantidade de pedidos pendentes, de pedidos
+    atualizados e o erro do Mercado Pago, se houver.
+    """
+    now = datetime.utcnow()
+    orders = Order.query.filter(
+        Order.status.in_(AWAITING_PAYMENT_STATUSES),
+        Order.created_at >= now - timedelta(hours=window_hours)
+    ).all()
+    if not orders:
+        return {'pending': 0, 'updated': 0, 'error': None}
+
+    orders_by_reference = {str(order.id): order for order in orders}
+    begin_date = min(order.created_at for order in orders) - timedelta(minutes=5)
+    end_date = now + timedelta(minutes=5)
+
+    # Uma busca por período (em páginas) cobre todos os pedidos pendentes; buscar
+    # por external_reference exigiria uma requisição por pedido
+    # Melhor pagamento de cada pedido (aprovado antes dos demais; depois o mais recente)
+    payments = {}
+    offset = 0
+    while True:
+        page = api.search_payments(begin_date, end_date, offset=offset, limit=SEARCH_PAGE_SIZE)
+        if 'error' in page:
+            return {'pending': len(orders), 'updated': 0, 'error': page['error']}
+
+        results = page.get('results') or []
+        for payment in results:
+            reference = str(payment.get('external_reference') or '')
+            if reference not in orders_by_reference:
+                continue
+            current = payments.get(reference)
+            priority = PAYMENT_PRIORITY.get(payment.get('status'), 0)
+            if current is None or priority >= PAYMENT_PRIORITY.get(current.get('status'), 0):
+                payments[reference] = payment
+
+        offset += len(results)
+        total = (page.get('paging') or {}).get('total', 0)
+        if not results or offset >= total:
+            break
+
+    if not payments:
+        return {'pending': len(orders), 'updated': 0, 'error': None}
+
+    # Relê os pedidos na transação de escrita: durante a busca o webhook ou o
+    # processamento podem ter mudado o status (apply_payment não volta atrás)
+    begin_write(db.session)
+    current_orders = Order.query.filter(
+        Order.id.in_([int(reference) for reference in payments])
+    ).populate_existing().all()
+
+    updated_count = 0
+    for order in current_orders:
+        if apply_payment(order, payments[str(order.id)]):
+            updated_count += 1
+
+    return {'pending': len(orders), 'updated': updated_count, 'error': None}
@@ -0,0 +1,140 @@
+"""
+Motor de precificação em lote (margens de lucro por regra)
+
+Cada regra define uma margem para um escopo: global, uma categoria, um
+tipo ou uma faixa de custo (rate_band). Quando várias regras se aplicam
+ao mesmo serviço vale a mais específica (categoria > tipo > faixa de
+custo > global) e, no mesmo escopo, a mais recente.
+
+Todas as regras são combinadas em uma única expressão CASE, de modo que
+aplicar (ou simular) o conjunto inteiro é um único UPDATE (ou SELECT).
+"""
+from sqlalchemy import and_, case, func, true, update
+from src.models.user import db, PricingRule, Service, Setting
+
+PRICING_SCOPES = ('category', 'type', 'rate_band', 'global')  # mais específico primeiro
+
+DEFAULT_PROFIT_MARGIN = 0.2
+
+def get_default_profit_margin():
+    """Margem usada para novos serviços (configuração default_profit_margin)"""
+    value = db.session.query(Setting.value).filter(Setting.key == 'default_profit_margin').scalar()
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PROFIT_MARGIN
+
+def validate_rule(data):
+    """Cria uma PricingRule (ainda não salva) a partir do JSON recebido
+
+    Lança ValueError com a mensagem de erro se os dados forem inválidos.
+    """
+    scope = data.get('scope')
+    if scope not in PRICING_SCOPES:
+        raise ValueError('scope must be one of: global, category, type, rate_band')
+
+    if data.get('profit_margin') is None:
+        raise ValueError('profit_margin is required')
+    profit_margin = float(data['profit_margin'])
+    if profit_margin < 0:
+        raise ValueError('profit_margin must be >= 0')
+
+    rule = PricingRule(scope=scope, profit_margin=profit_margin)
+
+    if scope in ('category', 'type'):
+        if not data.get('value'):
+            raise ValueError(f'value is required for scope {scope}')
+        rule.value = data['value']
+
+    if scope == 'rate_band':
+        min_rate = data.get('min_rate')
+        max_rate = data.get('max_rate')
+        if min_rate is None and max_rate is None:
+            raise ValueError('min_rate or max_rate is required for scope rate_band')
+        rule.min_rate = float(min_rate) if min_rate is not None else None
+        rule.max_rate = float(max_rate) if max_rate is not None else None
+        if rule.min_rate is not None and rule.max_rate is not None and rule.min_rate >= rule.max_rate:
+            raise ValueError('min_rate must be less than max_rate')
+
+    return rule
+
+def _rule_condition(rule):
+    if rule.scope == 'category':
+        return Service.category == rule.value
+    if rule.scope == 'type':
+        return Service.type == rule.value
+    if rule.scope == 'rate_band':
+        conditions = []
+        if rule.min_rate is not None:
+            conditions.append(Service.rate >= rule.min_rate)
+        if rule.max_rate is not None:
+            conditions.append(Service.rate < rule.max_rate)
+        return and_(*conditions)
+    return true()
+
+def _rule_priority(rule):
+    # Regras ainda não salvas (simulação) contam como as mais recentes
+    newest = rule.id if rule.id is not None else float('inf')
+    return (PRICING_SCOPES.index(rule.scope), -newest)
+
+def resolved_margin(rules):
+    """Expressão SQL com a margem resultante das regras para cada serviço"""
+    if not rules:
+        return Service.profit_margin
+    ordered = sorted(rules, key=_rule_priority)
+    return case(
+        *[(_rule_condition(rule), rule.profit_margin) for rule in ordered],
+        else_=Service.profit_margin
+    )
+
+def _affected_filter(new_margin, service_ids):
+    conditions = [new_margin != Service.profit_margin]
+    if service_ids is not None:
+        conditions.append(Service.id.in_(service_ids))
+    return and_(*conditions)
+
+def preview_pricing(rules=None, service_ids=None):
+    """Simula a aplicação das regras e resume as variações de preço (por unidade)"""
+    if rules is None:
+        rules = PricingRule.query.all()
+
+    new_margin = resolved_margin(rules)
+    delta = Service.rate * (new_margin - Service.profit_margin)
+
+    row = db.session.query(
+        func.count(Service.id),
+        func.min(delta),
+        func.max(delta),
+        func.avg(delta),
+        func.sum(case((delta > 0, 1), else_=0)),
+        func.sum(case((delta < 0, 1), else_=0))
+    ).filter(_affected_filter(new_margin, service_ids)).one()
+
+    count, min_delta, max_delta, avg_delta, increased, decreased = row
+    return {
+        'services_affected': count or 0,
+        'price_increased': int(increased or 0),
+        'price_decreased': int(decreased or 0),
+        'min_price_delta': round(min_delta or 0, 4),
+        'max_price_delta': round(max_delta or 0, 4),
+        'avg_price_delta': round(avg_delta or 0, 4)
+    }
+
+def apply_pricing_rules(rules=None, service_ids=None):
+    """Aplica as regras com um único UPDATE; retorna quantos serviços mudaram
+
+    Não faz commit. Com service_ids, restringe a atualização a esses serviços.
+    """
+    if rules is None:
+        rules = PricingRule.query.all()
+    if not rules:
+        return 0
+
+    new_margin = resolved_margin(rules)
+    result = db.session.execute(
+        update(Service)
+        .where(_affected_filter(new_margin, service_ids))
+        .values(profit_margin=new_margin)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
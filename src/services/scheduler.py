@@ -0,0 +1,164 @@
+"""
+Jobs periódicos com eleição de líder entre processos
+
+Cada job tem um lease na tabela job_lease. Em cada execução, o processo
+tenta adquirir (ou renovar) o lease com um UPDATE condicional: só um
+processo por vez consegue, e apenas ele executa o job. Enquanto o job
+roda, uma thread de heartbeat renova o lease; se o processo líder morrer,
+o lease expira e outro processo assume na sua próxima execução.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import or_, update
+from sqlalchemy.dialects.sqlite import insert
+from src.models.user import db, JobLease
+from src.services.tracing import tracer
+
+# Intervalo (segundos) entre renovações dos leases detidos por este processo
+HEARTBEAT_INTERVAL = 10
+
+def try_acquire_lease(name, owner, ttl):
+    """Adquire ou renova o lease de um job; retorna True se este processo é o líder"""
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=ttl)
+
+    # Cria o lease se ele ainda não existir
+    created = db.session.execute(
+        insert(JobLease).values(
+            name=name, owner=owner, expires_at=expires_at, heartbeat_at=now
+        ).on_conflict_do_nothing(index_elements=['name'])
+    ).rowcount
+
+    acquired = created
+    if not created:
+        # Renova se já for o dono ou assume se o lease expirou
+        acquired = db.session.execute(
+            update(JobLease).where(
+                JobLease.name == name,
+                or_(JobLease.owner == owner, JobLease.expires_at < now)
+            ).values(owner=owner, expires_at=expires_at, heartbeat_at=now)
+        ).rowcount
+
+    db.session.commit()
+    return acquired == 1
+
+def release_lease(name, owner):
+    """Libera o lease para que outro processo possa assumir imediatamente"""
+    db.session.execute(
+        update(JobLease).where(
+            JobLease.name == name,
+            JobLease.owner == owner
+        ).values(expires_at=datetime.utcnow())
+    )
+    db.session.commit()
+
+class PeriodicJob:
+    def __init__(self, name, func, interval, lease_ttl=None):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        # O lease sobrevive a pelo menos algumas execuções: o líder se mantém estável
+        self.lease_ttl = lease_ttl or max(interval * 3, HEARTBEAT_INTERVAL * 3)
+
+class Scheduler:
+    """Executa os jobs registrados em threads daemon do processo atual"""
+
+    def __init__(self):
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._held = set()
+        self._pid = None
+        self._stop = threading.Event()
+        self.owner = None
+
+    def register(self, name, interval, lease_ttl=None):
+        """Decorator que registra uma função como job periódico
+
+        `interval` pode ser um número de segundos ou uma chave de app.config.
+        """
+        def decorator(func):
+            self.jobs[name] = PeriodicJob(name, func, interval, lease_ttl)
+            return func
+        return decorator
+
+    def ensure_started(self, app):
+        """Inicia as threads do scheduler uma vez por processo (também após fork)"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._held = set()
+            self._stop = threading.Event()
+            self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+            for job in self.jobs.values():
+                if isinstance(job.interval, str):
+                    job.interval = float(app.config.get(job.interval, 0))
+                    job.lease_ttl = max(job.interval * 3, HEARTBEAT_INTERVAL * 3)
+                if job.interval <= 0:
+                    continue
+                threading.Thread(
+                    target=self._run_job, args=(app, job), name=f'job-{job.name}', daemon=True
+                ).start()
+
+            threading.Thread(
+                target=self._heartbeat, args=(app,), name='job-heartbeat', daemon=True
+            ).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run_job(self, app, job):
+        while not self._stop.is_set():
+            started_at = time.monotonic()
+            with app.app_context():
+                try:
+                    if try_acquire_lease(job.name, self.owner, job.lease_ttl):
+                        with self._lock:
+                            self._held.add(job.name)
+                        with tracer.trace(f'job {job.name}'):
+                            job.func()
+                    else:
+                        with self._lock:
+                            self._held.discard(job.name)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"✗ Erro no job {job.name}: {str(e)}")
+                finally:
+                    db.session.remove()
+
+            elapsed = time.monotonic() - started_at
+            self._stop.wait(max(job.interval - elapsed, 1))
+
+        with app.app_context():
+            try:
+                if job.name in self._held:
+                    release_lease(job.name, self.owner)
+            finally:
+                db.session.remove()
+
+    def _heartbeat(self, app):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            with self._lock:
+                held = list(self._held)
+            if not held:
+                continue
+
+            with app.app_context():
+                try:
+                    for name in held:
+                        job = self.jobs[name]
+                        if not try_acquire_lease(name, self.owner, job.lease_ttl):
+                            with self._lock:
+                                self._held.discard(name)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"✗ Erro ao renovar leases: {str(e)}")
+                finally:
+                    db.session.remove()
+
+scheduler = Scheduler()
@@ -0,0 +1,95 @@
+"""
+Busca textual do catálogo de serviços com SQLite FTS5
+
+O índice é uma tabela virtual FTS5 (service_fts) cujo rowid é o id do
+serviço. Ele é atualizado por quem altera o catálogo (sincronização e
+edição de serviços), na mesma transação da alteração.
+"""
+import re
+from sqlalchemy import bindparam, text
+from src.models.user import db, Service
+
+FTS_TABLE = 'service_fts'
+
+# Pesos do bm25 para as colunas name, description e category
+RANK_WEIGHTS = (10.0, 1.0, 5.0)
+
+def ensure_search_index():
+    """Cria a tabela FTS5 se necessário; retorna True se ela foi criada agora"""
+    exists = db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': FTS_TABLE}
+    ).first()
+    if exists:
+        return False
+
+    db.session.execute(text(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+        "name, description, category, tokenize = 'unicode61 remove_diacritics 2')"
+    ))
+    return True
+
+def index_services(service_ids=None):
+    """Atualiza o índice de busca
+
+    Sem argumentos reconstrói o índice inteiro; com uma lista de ids
+    reindexa apenas esses serviços. Não faz commit.
+    """
+    columns = "id, name, COALESCE(description, ''), COALESCE(category, '')"
+
+    if service_ids is None:
+        db.session.execute(text(f"DELETE FROM {FTS_TABLE}"))
+        db.session.execute(text(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, description, category) "
+            f"SELECT {columns} FROM service"
+        ))
+        return
+
+    service_ids = list(service_ids)
+    if not service_ids:
+        return
+
+    ids = bindparam('ids', expanding=True)
+    db.session.execute(
+        text(f"DELETE FROM {FTS_TABLE} WHERE rowid IN :ids").bindparams(ids),
+        {'ids': service_ids}
+    )
+    db.session.execute(
+        text(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, description, category) "
+            f"SELECT {columns} FROM service WHERE id IN :ids"
+        ).bindparams(ids),
+        {'ids': service_ids}
+    )
+
+def build_match_query(query):
+    """Converte o texto digitado em uma expressão MATCH segura (busca por prefixo)"""
+    terms = re.findall(r'\w+', query or '', re.UNICODE)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+def search_services(query, page=1, per_page=20):
+    """Busca serviços por relevância; retorna (serviços, total)"""
+    match = build_match_query(query)
+    if not match:
+        return [], 0
+
+    total = db.session.execute(
+        text(f"SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"),
+        {'match': match}
+    ).scalar()
+
+    weights = ', '.join(str(weight) for weight in RANK_WEIGHTS)
+    rows = db.session.execute(
+        text(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match "
+            f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT :limit OFFSET :offset"
+        ),
+        {'match': match, 'limit': per_page, 'offset': (page - 1) * per_page}
+    ).all()
+
+    ids = [row[0] for row in rows]
+    if not ids:
+        return [], total
+
+    services_by_id = {service.id: service for service in Service.query.filter(Service.id.in_(ids))}
+    return [services_by_id[service_id] for service_id in ids if service_id in services_by_id], total
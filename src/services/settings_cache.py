@@ -0,0 +1,94 @@
+"""
+Configurações do sistema: gravação em lote e cache em memória
+
+Toda gravação de configurações troca o valor de settings_version no mesmo
+statement. Cada processo guarda as configurações em memória e só confere
+essa versão (uma consulta pelo índice único de Setting.key) a cada
+VERSION_CHECK_INTERVAL segundos; quando ela muda, recarrega todas as
+configurações de uma vez.
+"""
+import threading
+import time
+import uuid
+from sqlalchemy.dialects.sqlite import insert
+from src.models.user import db, Setting
+
+SETTINGS_VERSION_KEY = 'settings_version'
+
+# Intervalo (segundos) entre verificações da versão das configurações
+VERSION_CHECK_INTERVAL = 5
+
+def upsert_settings(values):
+    """Grava várias configurações com um único INSERT ... ON CONFLICT; não faz commit
+
+    Carrega os valores atuais em uma única consulta e grava apenas as chaves
+    que mudaram, junto com uma nova settings_version. Retorna (criadas, atualizadas).
+    """
+    values = {key: str(value) for key, value in values.items()}
+    if not values:
+        return [], []
+
+    current = dict(
+        db.session.query(Setting.key, Setting.value).filter(Setting.key.in_(list(values))).all()
+    )
+    created = [key for key in values if key not in current]
+    updated = [key for key in values if key in current and current[key] != values[key]]
+    if not created and not updated:
+        return created, updated
+
+    rows = [{'key': key, 'value': values[key]} for key in created + updated]
+    rows.append({'key': SETTINGS_VERSION_KEY, 'value': uuid.uuid4().hex})
+
+    statement = insert(Setting).values(rows)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['key'],
+        set_={'value': statement.excluded.value}
+    ))
+    # Objetos Setting já carregados nesta sessão passam a ler o valor novo
+    db.session.expire_all()
+    return created, updated
+
+def bump_settings_version():
+    """Invalida o cache de configurações de todos os processos; não faz commit"""
+    statement = insert(Setting).values(key=SETTINGS_VERSION_KEY, value=uuid.uuid4().hex)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['key'],
+        set_={'value': statement.excluded.value}
+    ))
+
+class SettingsCache:
+    """Configurações em memória, recarregadas quando settings_version muda"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = None
+        self._version = None
+        self._checked_at = 0
+
+    def get(self, key, default=None):
+        return self._load().get(key, default)
+
+    def invalidate(self):
+        """Força a releitura na próxima chamada (usado após gravar neste processo)"""
+        with self._lock:
+            self._values = None
+
+    def _load(self):
+        with self._lock:
+            if self._values is not None and time.monotonic() - self._checked_at < VERSION_CHECK_INTERVAL:
+                return self._values
+            values, version = self._values, self._version
+
+        current_version = db.session.query(Setting.value).filter(
+            Setting.key == SETTINGS_VERSION_KEY
+        ).scalar()
+        if values is None or current_version != version:
+            values = dict(db.session.query(Setting.key, Setting.value).all())
+
+        with self._lock:
+            self._values = values
+            self._version = current_version
+            self._checked_at = time.monotonic()
+        return values
+
+settings_cache = SettingsCache()
@@ -0,0 +1,279 @@
+"""
+Rastreamento (tracing) de requisições: rotas, banco de dados e APIs externas
+
+Cada requisição recebe um trace (ou continua o recebido no header W3C
+traceparent). Dentro dele são registrados spans para as consultas SQL, as
+ações do Barato Sociais e as chamadas ao Mercado Pago; o traceparent é
+repassado às APIs externas. Ao final da requisição o trace é exportado no
+formato JSON do Zipkin (v2), em segundo plano, para um arquivo (uma linha
+por trace) ou para um coletor HTTP (ex.: http://localhost:9411/api/v2/spans).
+
+Desativado por padrão: configure TRACING_EXPORT com o caminho do arquivo
+ou a URL do coletor.
+"""
+import contextvars
+import json
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+import requests
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Tamanho máximo do SQL registrado em cada span
+MAX_STATEMENT_LENGTH = 500
+
+# Traces aguardando exportação; quando a fila enche, os novos são descartados
+EXPORT_QUEUE_SIZE = 1000
+
+TRACEPARENT_PATTERN = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+class Trace:
+    def __init__(self, trace_id=None, remote_parent_id=None):
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.remote_parent_id = remote_parent_id
+        self.spans = []
+
+class Span:
+    def __init__(self, trace, name, parent_id=None, kind=None, tags=None):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.tags = {}
+        self.timestamp = time.time()
+        self.duration = None
+        self._started_at = time.perf_counter()
+        for key, value in (tags or {}).items():
+            self.set_tag(key, value)
+
+    def set_tag(self, key, value):
+        self.tags[key] = str(value)
+
+    def finish(self):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._started_at
+            self.trace.spans.append(self)
+
+    def to_zipkin(self, service_name):
+        span = {
+            'traceId': self.trace.trace_id,
+            'id': self.span_id,
+            'name': self.name,
+            'timestamp': int(self.timestamp * 1_000_000),
+            'duration': max(int((self.duration or 0) * 1_000_000), 1),
+            'localEndpoint': {'serviceName': service_name},
+            'tags': self.tags
+        }
+        if self.parent_id:
+            span['parentId'] = self.parent_id
+        if self.kind:
+            span['kind'] = self.kind
+        return span
+
+def parse_traceparent(value):
+    """Extrai (trace_id, span_id do pai, amostrado) de um header traceparent"""
+    match = TRACEPARENT_PATTERN.match((value or '').strip().lower())
+    if not match:
+        return None
+    trace_id, parent_id, flags = match.groups()
+    if trace_id == '0' * 32 or parent_id == '0' * 16:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+class SpanExporter:
+    """Envia os traces finalizados em uma thread daemon (não atrasa as respostas)"""
+
+    def __init__(self, target, service_name):
+        self.target = target
+        self.service_name = service_name
+        self._queue = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def export(self, trace):
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            pass
+
+    def _ensure_thread(self):
+        with self._lock:
+            # Também recria a thread em workers criados por fork
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            trace = self._queue.get()
+            spans = [span.to_zipkin(self.service_name) for span in trace.spans]
+            try:
+                if self.target.startswith(('http://', 'https://')):
+                    requests.post(self.target, json=spans, timeout=5)
+                else:
+                    with open(self.target, 'a', encoding='utf-8') as export_file:
+                        export_file.write(json.dumps(spans) + '\n')
+            except Exception as e:
+                print(f"✗ Erro ao exportar trace: {str(e)}")
+
+class Tracer:
+    def __init__(self):
+        self.exporter = None
+        self.sample_rate = 1.0
+
+    @property
+    def enabled(self):
+        return self.exporter is not None
+
+    def configure(self, target, service_name, sample_rate=1.0):
+        self.exporter = SpanExporter(target, service_name) if target else None
+        self.sample_rate = sample_rate
+
+    def begin_trace(self, name, traceparent=None, kind=None, tags=None):
+        """Abre o span raiz de um trace; retorna (span, token) ou None se não amostrado"""
+        if not self.enabled:
+            return None
+
+        parent = parse_traceparent(traceparent)
+        if parent:
+            trace_id, parent_id, sampled = parent
+            if not sampled:
+                return None
+            trace = Trace(trace_id, parent_id)
+        else:
+            if random.random() >= self.sample_rate:
+                return None
+            trace = Trace()
+
+        span = Span(trace, name, parent_id=trace.remote_parent_id, kind=kind, tags=tags)
+        return span, _current_span.set(span)
+
+    def end_trace(self, started):
+        """Fecha o span raiz aberto por begin_trace e exporta o trace"""
+        if not started:
+            return
+        span, token = started
+        span.finish()
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # Token criado em outro contexto (ex.: resposta em streaming)
+            _current_span.set(None)
+        self.exporter.export(span.trace)
+
+    @contextmanager
+    def trace(self, name, kind=None, tags=None):
+        """Executa o bloco em um trace próprio (ex.: jobs periódicos)"""
+        started = self.begin_trace(name, kind=kind, tags=tags)
+        try:
+            yield started[0] if started else None
+        except Exception as e:
+            if started:
+                started[0].set_tag('error', str(e))
+            raise
+        finally:
+            self.end_trace(started)
+
+    @contextmanager
+    def span(self, name, kind=None, tags=None):
+        """Registra um span filho do span atual (nada é feito fora de um trace)"""
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+
+        span = Span(parent.trace, name, parent_id=parent.span_id, kind=kind, tags=tags)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.set_tag('error', str(e))
+            raise
+        finally:
+            span.finish()
+            _current_span.reset(token)
+
+    def current_trace_id(self):
+        span = _current_span.get()
+        return span.trace.trace_id if span else None
+
+    def outgoing_headers(self):
+        """Header traceparent para repassar o trace atual a uma API externa"""
+        span = _current_span.get()
+        if span is None:
+            return {}
+        return {'traceparent': f'00-{span.trace.trace_id}-{span.span_id}-01'}
+
+tracer = Tracer()
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query_span(conn, cursor, statement, parameters, context, executemany):
+    parent = _current_span.get()
+    if parent is None:
+        return
+    span = Span(parent.trace, 'db.query', parent_id=parent.span_id, kind='CLIENT', tags={
+        'db.system': conn.engine.dialect.name,
+        'db.statement': statement[:MAX_STATEMENT_LENGTH]
+    })
+    conn.info.setdefault('trace_spans', []).append(span)
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _finish_query_span(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get('trace_spans')
+    if spans:
+        spans.pop().finish()
+
+@event.listens_for(Engine, 'handle_error')
+def _fail_query_span(exception_context):
+    connection = exception_context.connection
+    spans = connection.info.get('trace_spans') if connection is not None else None
+    if spans:
+        span = spans.pop()
+        span.set_tag('error', str(exception_context.original_exception))
+        span.finish()
+
+def init_app(app):
+    """Abre um trace por requisição quando TRACING_EXPORT está configurado"""
+    from flask import g, request
+
+    tracer.configure(
+        app.config.get('TRACING_EXPORT'),
+        app.config.get('TRACING_SERVICE_NAME', 'influenciando'),
+        app.config.get('TRACING_SAMPLE_RATE', 1.0)
+    )
+    if not tracer.enabled:
+        return
+
+    @app.before_request
+    def start_request_trace():
+        rule = request.url_rule.rule if request.url_rule else request.path
+        g.trace = tracer.begin_trace(
+            f'{request.method} {rule}',
+            traceparent=request.headers.get('traceparent'),
+            kind='SERVER',
+            tags={'http.method': request.method, 'http.path': request.path}
+        )
+
+    @app.after_request
+    def tag_request_trace(response):
+        started = g.get('trace')
+        if started:
+            started[0].set_tag('http.status_code', response.status_code)
+            response.headers['X-Trace-Id'] = started[0].trace.trace_id
+        return response
+
+    @app.teardown_request
+    def finish_request_trace(exception=None):
+        started = g.pop('trace', None)
+        if started and exception is not None:
+            started[0].set_tag('error', str(exception))
+        tracer.end_trace(started)
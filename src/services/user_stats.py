@@ -0,0 +1,132 @@
+"""
+Contadores de pedidos por usuário (quantidade e valor por status)
+
+A tabela user_stats é atualizada no mesmo flush que cria um pedido ou
+muda o seu status, em qualquer caminho (criação, webhook, processamento,
+sincronização), com um único UPSERT por flush. Assim o gasto total e a
+quantidade de pedidos de um usuário não exigem agregar a tabela order.
+"""
+from sqlalchemy import event, inspect, select, union_all, func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from src.models.user import db, Order, OrderArchive, UserStats
+
+# Status em que o valor do pedido não conta como gasto do usuário
+NOT_SPENT_STATUSES = [
+    'Pending Payment', 'Payment Rejected', 'Payment Cancelled', 'Payment Processing',
+    'Refunded', 'Canceled'
+]
+
+def is_spent(status):
+    return status not in NOT_SPENT_STATUSES and not status.startswith('Payment ')
+
+@event.listens_for(Session, 'after_flush')
+def _update_user_stats(session, flush_context):
+    deltas = {}
+
+    def add(user_id, status, count, amount):
+        key = (user_id, status)
+        current = deltas.get(key, (0, 0.0))
+        deltas[key] = (current[0] + count, current[1] + amount)
+
+    for obj in session.new:
+        if isinstance(obj, Order):
+            add(obj.user_id, obj.status, 1, obj.price_paid or 0)
+
+    for obj in session.dirty:
+        if not isinstance(obj, Order):
+            continue
+        history = inspect(obj).attrs.status.history
+        if not history.deleted or history.deleted[0] == obj.status:
+            continue
+        add(obj.user_id, history.deleted[0], -1, -(obj.price_paid or 0))
+        add(obj.user_id, obj.status, 1, obj.price_paid or 0)
+
+    rows = [
+        {'user_id': user_id, 'status': status, 'order_count': count, 'total_amount': amount}
+        for (user_id, status), (count, amount) in deltas.items()
+        if count or amount
+    ]
+    if not rows:
+        return
+
+    statement = insert(UserStats).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=['user_id', 'status'],
+        set_={
+            'order_count': UserStats.order_count + statement.excluded.order_count,
+            'total_amount': UserStats.total_amount + statement.excluded.total_amount
+        }
+    )
+    session.connection().execute(statement)
+
+def get_user_stats(user_ids):
+    """Resumo dos contadores de vários usuários, em uma única consulta"""
+    stats = {
+        user_id: {'order_count': 0, 'total_spent': 0.0, 'orders_by_status': {}}
+        for user_id in user_ids
+    }
+    if not stats:
+        return stats
+
+    rows = db.session.query(
+        UserStats.user_id, UserStats.status, UserStats.order_count, UserStats.total_amount
+    ).filter(UserStats.user_id.in_(list(stats))).all()
+
+    for user_id, status, order_count, total_amount in rows:
+        if not order_count:
+            continue
+        user_stats = stats[user_id]
+        user_stats['order_count'] += order_count
+        user_stats['orders_by_status'][status] = order_count
+        if is_spent(status):
+            user_stats['total_spent'] += total_amount
+
+    for user_stats in stats.values():
+        user_stats['total_spent'] = round(user_stats['total_spent'], 2)
+    return stats
+
+def _computed_stats():
+    """Contadores calculados do zero a partir dos pedidos ativos e arquivados"""
+    orders = union_all(
+        select(Order.user_id, Order.status, Order.price_paid),
+        select(OrderArchive.user_id, OrderArchive.status, OrderArchive.price_paid)
+    ).subquery()
+    return select(
+        orders.c.user_id,
+        orders.c.status,
+        func.count().label('order_count'),
+        func.coalesce(func.sum(orders.c.price_paid), 0).label('total_amount')
+    ).group_by(orders.c.user_id, orders.c.status)
+
+def check_user_stats():
+    """Compara os contadores com os pedidos; retorna a lista de divergências"""
+    expected = {
+        (row.user_id, row.status): (row.order_count, round(row.total_amount, 2))
+        for row in db.session.execute(_computed_stats())
+    }
+    current = {
+        (row.user_id, row.status): (row.order_count, round(row.total_amount, 2))
+        for row in UserStats.query.filter(UserStats.order_count != 0)
+    }
+
+    mismatches = []
+    for key in sorted(set(expected) | set(current), key=str):
+        if expected.get(key) != current.get(key):
+            mismatches.append({
+                'user_id': key[0],
+                'status': key[1],
+                'expected': expected.get(key),
+                'current': current.get(key)
+            })
+    return mismatches
+
+def rebuild_user_stats():
+    """Recria todos os contadores a partir dos pedidos; não faz commit"""
+    db.session.query(UserStats).delete(synchronize_session=False)
+    db.session.execute(
+        insert(UserStats).from_select(
+            ['user_id', 'status', 'order_count', 'total_amount'],
+            _computed_stats()
+        )
+    )
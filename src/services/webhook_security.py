@@ -0,0 +1,107 @@
+"""
+Verificação das notificações (webhooks) do Mercado Pago
+
+O Mercado Pago assina cada notificação com HMAC-SHA256 usando a chave
+secreta do webhook (Setting mp_webhook_secret). O header x-signature traz
+"ts=<timestamp>,v1=<hash>" e o hash é calculado sobre o manifesto
+"id:<data.id>;request-id:<x-request-id>;ts:<ts>;".
+
+Notificações com assinatura inválida, fora da janela de tempo ou com um
+x-request-id já visto são descartadas antes de qualquer chamada à API. Os
+x-request-id aceitos ficam no banco (tabela webhook_notification), para
+que um replay enviado a outro worker também seja reconhecido.
+"""
+import hashlib
+import hmac
+import time
+from datetime import datetime, timedelta
+from sqlalchemy.dialects.sqlite import insert
+from src.models.user import db, WebhookNotification
+
+# Diferença máxima (segundos) entre o timestamp assinado e o relógio local
+SIGNATURE_TOLERANCE = 300
+
+def parse_signature(header):
+    """Extrai (ts, v1) do header x-signature; retorna (None, None) se malformado"""
+    parts = {}
+    for part in (header or '').split(','):
+        key, _, value = part.strip().partition('=')
+        if key and value:
+            parts[key.strip()] = value.strip()
+    return parts.get('ts'), parts.get('v1')
+
+def build_manifest(data_id, request_id, ts):
+    """Monta o texto assinado; partes ausentes são omitidas, como faz o Mercado Pago"""
+    manifest = ''
+    if data_id:
+        # Ids alfanuméricos são assinados em minúsculas
+        manifest += f'id:{str(data_id).lower()};'
+    if request_id:
+        manifest += f'request-id:{request_id};'
+    manifest += f'ts:{ts};'
+    return manifest
+
+def _timestamp_seconds(ts):
+    value = int(ts)
+    # O timestamp pode vir em milissegundos
+    return value / 1000 if value > 10 ** 11 else value
+
+def verify_signature(secret, signature_header, request_id, data_id, now=None, tolerance=SIGNATURE_TOLERANCE):
+    """Valida a assinatura de uma notificação; retorna None se válida ou o motivo da recusa"""
+    ts, received = parse_signature(signature_header)
+    if not ts or not received:
+        return 'Missing or malformed signature'
+
+    try:
+        signed_at = _timestamp_seconds(ts)
+    except ValueError:
+        return 'Invalid signature timestamp'
+
+    now = time.time() if now is None else now
+    if abs(now - signed_at) > tolerance:
+        return 'Signature timestamp outside the allowed window'
+
+    expected = hmac.new(
+        secret.encode('utf-8'),
+        build_manifest(data_id, request_id, ts).encode('utf-8'),
+        hashlib.sha256
+    ).hexdigest()
+    if not hmac.compare_digest(expected, received.lower()):
+        return 'Invalid signature'
+
+    return None
+
+class ReplayCache:
+    """Ids de notificações já aceitas, lembrados durante a janela de tempo da assinatura
+
+    Depois da janela a notificação é recusada pelo timestamp, então os ids
+    mais antigos são removidos a cada nova gravação.
+    """
+
+    def __init__(self, ttl=SIGNATURE_TOLERANCE):
+        self.ttl = ttl
+
+    def _cutoff(self):
+        return datetime.utcnow() - timedelta(seconds=self.ttl)
+
+    def seen(self, key):
+        """Indica se o id já foi aceito dentro da janela (por qualquer processo)"""
+        return db.session.query(WebhookNotification.request_id).filter(
+            WebhookNotification.request_id == key,
+            WebhookNotification.seen_at >= self._cutoff()
+        ).first() is not None
+
+    def add(self, key):
+        """Registra um id aceito (após o processamento, para que falhas possam ser reenviadas); não faz commit"""
+        db.session.query(WebhookNotification).filter(
+            WebhookNotification.seen_at < self._cutoff()
+        ).delete(synchronize_session=False)
+
+        now = datetime.utcnow()
+        statement = insert(WebhookNotification).values(request_id=key, seen_at=now)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['request_id'],
+            set_={'seen_at': now}
+        ))
+
+seen_notifications = ReplayCache()
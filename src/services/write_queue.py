@@ -0,0 +1,150 @@
+"""
+Fila de escritas com commit em grupo (group commit) para o SQLite
+
+Com WRITE_QUEUE_ENABLED=1, as escritas de alto volume (criação de pedidos,
+atualizações vindas do webhook) são enfileiradas em memória. Uma thread
+do processo executa até WRITE_QUEUE_MAX_ITEMS escritas, ou as que chegarem
+em WRITE_QUEUE_MAX_DELAY_MS milissegundos, em uma única transação: um só
+fsync e uma só disputa pelo lock de escrita para o grupo inteiro.
+
+Cada escrita roda em um SAVEPOINT próprio: se ela falhar, apenas ela é
+desfeita e o chamador recebe a exceção; as demais seguem no commit do
+grupo. Se o commit falhar, todos os chamadores do grupo recebem o erro.
+No SQLite o grupo é aberto com um BEGIN IMMEDIATE explícito: sem ele o
+driver (pysqlite) não inicia a transação antes do SAVEPOINT e cada RELEASE
+confirmaria a escrita isoladamente.
+
+Se o chamador desistir por timeout (WRITE_QUEUE_TIMEOUT) antes de a
+escrita começar, ela é cancelada e não será executada; se já estiver em
+execução, o chamador aguarda o commit do grupo por mais um timeout. Erros
+inesperados de um grupo são registrados e a thread segue com os próximos.
+
+A função enviada roda na sessão da thread da fila (db.session), não na
+sessão da requisição; ela deve receber ids/valores simples e retornar um
+valor simples (id, dicionário), calculado depois de um flush. Com a fila
+desativada a função roda na própria requisição, seguida de commit.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from src.models.user import db
+
+class WriteQueue:
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.max_items = 50
+        self.max_delay = 0.005
+        self.timeout = 10
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('WRITE_QUEUE_ENABLED', False)
+        self.max_items = app.config.get('WRITE_QUEUE_MAX_ITEMS', self.max_items)
+        self.max_delay = app.config.get('WRITE_QUEUE_MAX_DELAY_MS', self.max_delay * 1000) / 1000
+        self.timeout = app.config.get('WRITE_QUEUE_TIMEOUT', self.timeout)
+
+    def submit(self, fn, *args, **kwargs):
+        """Executa fn(*args, **kwargs) em uma transação confirmada e retorna o seu resultado"""
+        if not self.enabled:
+            try:
+                result = fn(*args, **kwargs)
+                db.session.commit()
+                return result
+            except Exception:
+                db.session.rollback()
+                raise
+
+        self._ensure_thread()
+        future = Future()
+        self._queue.put((fn, args, kwargs, future))
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # Ainda na fila: cancela para que a escrita não aconteça depois do erro
+            if future.cancel():
+                raise
+            # Já em execução: o resultado depende do commit do grupo
+            return future.result(timeout=self.timeout)
+
+    def _ensure_thread(self):
+        with self._lock:
+            # Uma thread por processo (também após o fork dos workers)
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue()
+            threading.Thread(target=self._run, name='write-queue', daemon=True).start()
+
+    def _next_group(self):
+        group = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(group) < self.max_items:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                group.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return group
+
+    def _run(self):
+        while True:
+            group = self._next_group()
+            try:
+                with self.app.app_context():
+                    try:
+                        self._flush_group(group)
+                    finally:
+                        db.session.remove()
+            except Exception as e:
+                print(f"✗ Erro na fila de escritas: {str(e)}")
+                # Nenhum chamador do grupo fica esperando até o timeout
+                for _, _, _, future in group:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _flush_group(self, group):
+        if db.engine.dialect.name == 'sqlite':
+            # Uma única transação para o grupo (os SAVEPOINTs ficam dentro dela)
+            try:
+                db.session.connection().exec_driver_sql('BEGIN IMMEDIATE')
+            except Exception as e:
+                db.session.rollback()
+                for _, _, _, future in group:
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(e)
+                return
+
+        results = []
+        for fn, args, kwargs, future in group:
+            if not future.set_running_or_notify_cancel():
+                continue
+            savepoint = db.session.begin_nested()
+            try:
+                result = fn(*args, **kwargs)
+                savepoint.commit()
+                results.append((future, result))
+            except Exception as e:
+                if savepoint.is_active:
+                    savepoint.rollback()
+                future.set_exception(e)
+
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            for future, _ in results:
+                future.set_exception(e)
+            return
+
+        for future, result in results:
+            future.set_result(result)
+
+write_queue = WriteQueue()
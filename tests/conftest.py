@@ -0,0 +1,81 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import create_app, init_database
+from src.models.user import db, Order, Service, User
+from src.services.settings_cache import settings_cache
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}"
+    })
+    with app.app_context():
+        init_database()
+        settings_cache.invalidate()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+    settings_cache.invalidate()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def login(client, username='admin', password='admin123'):
+    response = client.post('/api/auth/login', json={'username': username, 'password': password})
+    assert response.status_code == 200
+    return response
+
+
+@pytest.fixture
+def service(app):
+    service = Service(
+        service_id_barato_sociais=1001,
+        name='Seguidores',
+        category='Instagram',
+        type='Default',
+        rate=1.0,
+        min=10,
+        max=1000,
+        profit_margin=0.5
+    )
+    db.session.add(service)
+    db.session.commit()
+    return service
+
+
+@pytest.fixture
+def make_order(app, service):
+    service_id = service.id
+
+    def make_order(status='Paid', username='user', **kwargs):
+        user = User.query.filter_by(username=username).first()
+        order = Order(
+            user_id=user.id,
+            service_id=service_id,
+            link='https://instagram.com/perfil',
+            quantity=100,
+            price_paid=150.0,
+            cost_to_us=100.0,
+            status=status,
+            **kwargs
+        )
+        db.session.add(order)
+        db.session.commit()
+        return order
+    return make_order
+
+
+def days_ago(days):
+    from datetime import timedelta
+    return datetime.utcnow() - timedelta(days=days)
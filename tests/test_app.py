@@ -0,0 +1,8 @@
+import pytest
+
+from src.main import create_app
+
+
+def test_non_sqlite_database_url_is_rejected():
+    with pytest.raises(ValueError, match='Only SQLite databases are supported'):
+        create_app({'SQLALCHEMY_DATABASE_URI': 'postgresql://localhost/influenciando'})
@@ -0,0 +1,93 @@
+from sqlalchemy import text
+
+from src.init_data import migrate_schema
+from src.models.user import db, Order, OrderArchive, Refill, RefillArchive
+from src.services.archive import archive_orders, get_order_or_archived
+from tests.conftest import days_ago, login
+
+
+def test_archive_round_trip(make_order):
+    old_id = make_order(status='Completed', updated_at=days_ago(120)).id
+    recent_id = make_order(status='Completed').id
+    active_id = make_order(status='Processing', updated_at=days_ago(120)).id
+
+    assert archive_orders(90) == 1
+
+    assert db.session.get(Order, old_id) is None
+    archived = get_order_or_archived(old_id)
+    assert isinstance(archived, OrderArchive)
+    assert archived.price_paid == 150.0
+    assert isinstance(get_order_or_archived(recent_id), Order)
+    assert isinstance(get_order_or_archived(active_id), Order)
+
+
+def test_order_ids_are_never_reused_after_archiving(make_order):
+    archived_ids = {make_order(status='Completed', updated_at=days_ago(120)).id for _ in range(3)}
+
+    # Todos os pedidos arquivados: a tabela order fica vazia
+    assert archive_orders(90) == 3
+    assert Order.query.count() == 0
+
+    new_order = make_order(status='Completed', updated_at=days_ago(120))
+    assert new_order.id > max(archived_ids)
+
+    # Um segundo arquivamento não colide com os ids já arquivados
+    assert archive_orders(90) == 1
+    assert OrderArchive.query.count() == 4
+
+
+def test_migration_rebuilds_legacy_order_table(make_order):
+    order_ids = [make_order(status='Completed', updated_at=days_ago(120)).id for _ in range(2)]
+    remaining_id = make_order(status='Paid').id
+    archive_orders(90)
+
+    # Simula um banco antigo: tabela order sem AUTOINCREMENT
+    with db.engine.begin() as connection:
+        connection.execute(text('ALTER TABLE "order" RENAME TO order_legacy'))
+        connection.execute(text(
+            'CREATE TABLE "order" AS SELECT * FROM order_legacy'
+        ))
+        connection.execute(text('DROP TABLE order_legacy'))
+        connection.execute(text("DELETE FROM sqlite_sequence WHERE name = 'order'"))
+    db.session.remove()
+
+    migrate_schema()
+
+    table_sql = db.session.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'order'"
+    )).scalar()
+    assert 'AUTOINCREMENT' in table_sql
+    assert db.session.get(Order, remaining_id).status == 'Paid'
+
+    new_order = make_order(status='Paid')
+    assert new_order.id > max(order_ids + [remaining_id])
+
+
+def test_refills_are_archived_with_their_order(make_order):
+    order_id = make_order(status='Completed', updated_at=days_ago(120)).id
+    db.session.add(Refill(refill_id_barato_sociais=501, order_id=order_id, status='Completed'))
+    db.session.commit()
+
+    assert archive_orders(90) == 1
+
+    assert Refill.query.count() == 0
+    archived = RefillArchive.query.one()
+    assert archived.order_id == order_id
+    assert archived.to_dict()['order_id_barato_sociais'] == archived.order.order_id_barato_sociais
+
+
+def test_order_list_includes_archive_only_on_request(client, make_order):
+    archived_id = make_order(status='Completed', updated_at=days_ago(120)).id
+    active_id = make_order(status='Paid').id
+    archive_orders(90)
+    login(client, 'user', 'user123')
+
+    default = client.get('/api/orders')
+    assert [order['id'] for order in default.get_json()['orders']] == [active_id]
+
+    with_archive = client.get('/api/orders?archived=1')
+    assert {order['id'] for order in with_archive.get_json()['orders']} == {active_id, archived_id}
+    assert with_archive.headers['ETag'] != default.headers['ETag']
+
+    # Leitura de um único pedido continua encontrando o arquivado
+    assert client.get(f'/api/orders/{archived_id}/status').status_code == 200
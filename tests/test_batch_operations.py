@@ -0,0 +1,83 @@
+import pytest
+
+from src.models.user import Refill
+from src.services import batch_operations
+from src.services.barato_sociais_async_api import AsyncBaratoSociaisAPI
+from tests.conftest import login
+
+# Pedido recusado individualmente e pedido cujo lote inteiro falha
+REJECTED_UPSTREAM_ID = 3
+FAILING_BATCH_UPSTREAM_ID = 5
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    batches = []
+
+    async def fake_make_request(self, data):
+        upstream_ids = [int(value) for value in data['orders'].split(',')]
+        batches.append((data['action'], upstream_ids))
+        if FAILING_BATCH_UPSTREAM_ID in upstream_ids:
+            return {'error': 'HTTP 500: erro no lote'}
+
+        result_key = 'refill' if data['action'] == 'refill' else 'cancel'
+        return [
+            {
+                'order': upstream_id,
+                result_key: {'error': 'Incorrect order ID'} if upstream_id == REJECTED_UPSTREAM_ID else upstream_id + 1000
+            }
+            for upstream_id in upstream_ids
+        ]
+
+    monkeypatch.setattr(AsyncBaratoSociaisAPI, '_make_request', fake_make_request)
+    # Lotes de 2 ids para exercitar a divisão em vários lotes
+    chunked = batch_operations.chunked
+    monkeypatch.setattr(batch_operations, 'chunked', lambda items, size=2: chunked(items, size))
+    return batches
+
+
+@pytest.fixture
+def orders(make_order):
+    submitted = {
+        upstream_id: make_order(status='Completed', order_id_barato_sociais=upstream_id).id
+        for upstream_id in range(1, 6)
+    }
+    not_submitted = make_order(status='Paid').id
+    return submitted, not_submitted
+
+
+def test_refill_is_requested_in_batches(client, upstream, orders):
+    submitted, not_submitted = orders
+    login(client)
+
+    response = client.post('/api/orders/refill', json={'order_ids': list(submitted.values()) + [not_submitted]})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert sorted(len(ids) for _, ids in upstream) == [1, 2, 2]
+    assert {refill['order_id'] for refill in data['refills']} == {submitted[1], submitted[2], submitted[4]}
+    assert {failure['order_id'] for failure in data['failed']} == {submitted[3], submitted[5]}
+    assert data['skipped'] == [not_submitted]
+    assert {refill.refill_id_barato_sociais for refill in Refill.query} == {1001, 1002, 1004}
+
+
+def test_cancel_is_requested_in_batches(client, upstream, orders):
+    submitted, not_submitted = orders
+    login(client)
+
+    response = client.post('/api/orders/cancel', json={'order_ids': list(submitted.values()) + [not_submitted]})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert all(action == 'cancel' for action, _ in upstream)
+    assert sorted(data['canceled']) == sorted([submitted[1], submitted[2], submitted[4]])
+    errors = {failure['order_id']: failure['error'] for failure in data['failed']}
+    assert errors == {submitted[3]: 'Incorrect order ID', submitted[5]: 'HTTP 500: erro no lote'}
+    assert data['skipped'] == [not_submitted]
+
+
+@pytest.mark.parametrize('body', [{}, {'order_ids': []}, {'order_ids': ['x']}])
+def test_batch_endpoints_validate_order_ids(client, body):
+    login(client)
+    assert client.post('/api/orders/refill', json=body).status_code == 400
+    assert client.post('/api/orders/cancel', json=body).status_code == 400
@@ -0,0 +1,52 @@
+import pytest
+from sqlalchemy import event
+
+from src.models.user import db
+from src.services.catalog import content_hash, get_latest_snapshot, store_snapshot
+from tests.conftest import login
+
+CATALOG = [{'service': 1001, 'name': 'Seguidores', 'rate': '1.0'}]
+
+
+@pytest.fixture
+def statements(app):
+    captured = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        captured.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_execute)
+    yield captured
+    event.remove(db.engine, 'before_cursor_execute', before_execute)
+
+
+def loads_payload(statements):
+    return any('catalog_snapshot.payload AS' in statement for statement in statements)
+
+
+def test_latest_snapshot_does_not_load_payload(app, statements):
+    store_snapshot(CATALOG, content_hash(CATALOG))
+    db.session.commit()
+    db.session.remove()
+    statements.clear()
+
+    snapshot = get_latest_snapshot()
+
+    assert snapshot.content_hash == content_hash(CATALOG)
+    assert not loads_payload(statements)
+    # O payload continua disponível quando necessário
+    assert snapshot.get_services() == CATALOG
+
+
+def test_snapshot_list_reports_size_without_loading_payload(client, statements):
+    snapshot = store_snapshot(CATALOG, content_hash(CATALOG))
+    db.session.commit()
+    expected_size = len(snapshot.payload)
+    login(client)
+    statements.clear()
+
+    response = client.get('/api/services/snapshots')
+
+    assert response.status_code == 200
+    assert response.get_json()['snapshots'][0]['size_bytes'] == expected_size
+    assert not loads_payload(statements)
@@ -0,0 +1,55 @@
+from src.models.user import db, Order
+from tests.conftest import login
+
+
+def get(client, url, etag=None):
+    headers = {'If-None-Match': etag} if etag else {}
+    return client.get(url, headers=headers)
+
+
+def test_order_list_returns_304_until_orders_change(client, make_order):
+    order_id = make_order(status='Paid').id
+    login(client, 'user', 'user123')
+
+    first = get(client, '/api/orders')
+    etag = first.headers['ETag']
+    assert first.status_code == 200
+    assert len(first.get_json()['orders']) == 1
+
+    cached = get(client, '/api/orders', etag)
+    assert cached.status_code == 304
+    assert cached.data == b''
+    assert cached.headers['ETag'] == etag
+
+    # Mudança de status: nova versão
+    db.session.get(Order, order_id).status = 'Processing'
+    db.session.commit()
+    changed = get(client, '/api/orders', etag)
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+    # Novo pedido: nova versão
+    make_order(status='Paid')
+    added = get(client, '/api/orders', changed.headers['ETag'])
+    assert added.status_code == 200
+    assert len(added.get_json()['orders']) == 2
+
+
+def test_order_status_returns_304_until_order_changes(client, make_order):
+    order_id = make_order(status='Paid').id
+    url = f'/api/orders/{order_id}/status'
+    login(client, 'user', 'user123')
+
+    first = get(client, url)
+    etag = first.headers['ETag']
+    assert first.status_code == 200
+    assert first.get_json()['order']['status'] == 'Paid'
+
+    assert get(client, url, etag).status_code == 304
+
+    db.session.get(Order, order_id).status = 'Completed'
+    db.session.commit()
+    changed = get(client, url, etag)
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert changed.get_json()['order']['status'] == 'Completed'
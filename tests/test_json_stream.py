@@ -0,0 +1,52 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from src.services.archive import archive_orders
+from src.services.json_stream import ITEMS_PER_CHUNK, iter_json_object, stream_json_list
+from tests.conftest import days_ago, login
+
+
+def render(key, items, extra=None):
+    return ''.join(iter_json_object(key, items, extra))
+
+
+@pytest.mark.parametrize('count', [0, 1, ITEMS_PER_CHUNK, ITEMS_PER_CHUNK * 2 + 1])
+def test_stream_produces_valid_json(app, count):
+    items = ({'id': index} for index in range(count))
+
+    data = json.loads(render('orders', items, extra={'total': count}))
+
+    assert data == {'orders': [{'id': index} for index in range(count)], 'total': count}
+
+
+def test_stream_uses_the_app_json_provider(app):
+    moment = datetime(2026, 1, 2, 3, 4, 5)
+    data = json.loads(render('items', [{'at': moment}]))
+    assert data['items'][0]['at'] == app.json.dumps(moment).strip('"')
+
+
+def test_stream_json_list_response(app):
+    with app.test_request_context():
+        response = stream_json_list('items', iter([{'id': 1}, {'id': 2}]))
+        assert response.mimetype == 'application/json'
+        assert response.is_streamed
+        assert json.loads(response.get_data()) == {'items': [{'id': 1}, {'id': 2}]}
+
+
+def test_order_list_merges_active_and_archived_by_created_at(client, make_order):
+    # Datas intercaladas entre a tabela ativa e o arquivo
+    ages = {'arquivado_1': 10, 'ativo_1': 20, 'arquivado_2': 30, 'ativo_2': 40}
+    ids = {}
+    for label, age in ages.items():
+        status = 'Completed' if label.startswith('arquivado') else 'Paid'
+        updated_at = days_ago(120) if label.startswith('arquivado') else days_ago(1)
+        ids[label] = make_order(status=status, created_at=days_ago(age), updated_at=updated_at).id
+    archive_orders(90)
+    login(client)
+
+    response = client.get('/api/orders?archived=1')
+
+    listed = [order['id'] for order in response.get_json()['orders']]
+    assert listed == [ids[label] for label in ['arquivado_1', 'ativo_1', 'arquivado_2', 'ativo_2']]
@@ -0,0 +1,99 @@
+import pytest
+
+from src.models.user import db, Order, OutboxMessage
+from src.routes import outbox as outbox_routes
+from src.services.outbox import enqueue_order_submission
+from tests.conftest import login
+
+
+class FakeBaratoSociaisAPI:
+    def __init__(self):
+        self.calls = []
+
+    def create_order(self, service_id, link, quantity):
+        self.calls.append((service_id, link, quantity))
+        return {'order': 555}
+
+
+@pytest.fixture
+def api(monkeypatch):
+    api = FakeBaratoSociaisAPI()
+    monkeypatch.setattr(outbox_routes, 'get_barato_sociais_api', lambda: api)
+    return api
+
+
+@pytest.fixture
+def dead_message(make_order):
+    def dead_message(status='dead'):
+        order = make_order(status='Paid')
+        message = enqueue_order_submission(order)
+        message.status = status
+        order.status = 'Paid'
+        db.session.commit()
+        return message.id, order.id
+    return dead_message
+
+
+def replay(client, message_id):
+    return client.post(f'/api/outbox/{message_id}/replay')
+
+
+def test_replay_delivers_dead_message(client, api, dead_message):
+    message_id, order_id = dead_message()
+    login(client)
+
+    response = replay(client, message_id)
+
+    assert response.status_code == 200
+    assert response.get_json()['outbox_message']['status'] == 'delivered'
+    assert len(api.calls) == 1
+    order = db.session.get(Order, order_id)
+    assert order.order_id_barato_sociais == 555
+    assert order.status == 'Processing'
+
+
+@pytest.mark.parametrize('status', ['pending', 'delivered'])
+def test_replay_rejects_messages_that_are_not_dead(client, api, dead_message, status):
+    message_id, _ = dead_message(status=status)
+    login(client)
+
+    assert replay(client, message_id).status_code == 409
+    assert api.calls == []
+
+
+def test_replay_rejects_order_already_submitted(client, api, dead_message):
+    message_id, order_id = dead_message()
+    db.session.get(Order, order_id).order_id_barato_sociais = 123
+    db.session.commit()
+    login(client)
+
+    assert replay(client, message_id).status_code == 409
+    assert api.calls == []
+
+
+def test_replay_rejects_order_with_another_active_message(client, api, dead_message):
+    message_id, order_id = dead_message()
+    db.session.add(OutboxMessage(
+        order_id=order_id,
+        kind='submit_order',
+        payload='{}',
+        status='pending',
+        attempts=0
+    ))
+    db.session.commit()
+    login(client)
+
+    assert replay(client, message_id).status_code == 409
+    assert api.calls == []
+
+
+def test_replay_without_order_returns_404(client, api, dead_message):
+    message_id, order_id = dead_message()
+    # Como no arquivamento: o pedido sai da tabela order, a mensagem fica
+    db.session.execute(db.delete(Order).where(Order.id == order_id))
+    db.session.commit()
+    login(client)
+
+    assert replay(client, message_id).status_code == 404
+    assert replay(client, message_id + 100).status_code == 404
+    assert api.calls == []
@@ -0,0 +1,79 @@
+from sqlalchemy import text
+
+from src.models.user import db, Order
+from src.services.payments import apply_payment_to_order, reconcile_payments
+from tests.conftest import days_ago
+
+
+class FakeMercadoPagoAPI:
+    def __init__(self, payments, during_search=None):
+        self.payments = payments
+        self.during_search = during_search
+
+    def search_payments(self, begin_date, end_date, offset=0, limit=100):
+        if self.during_search:
+            self.during_search()
+        return {'results': self.payments, 'paging': {'total': len(self.payments)}}
+
+
+def payment(order_id, status='approved', payment_id=9001):
+    return {'id': payment_id, 'status': status, 'external_reference': str(order_id)}
+
+
+def test_reconcile_marks_pending_order_as_paid(make_order):
+    order_id = make_order(status='Pending Payment').id
+
+    result = reconcile_payments(FakeMercadoPagoAPI([payment(order_id)]), 72)
+    db.session.commit()
+
+    assert result == {'pending': 1, 'updated': 1, 'error': None}
+    order = db.session.get(Order, order_id)
+    assert order.status == 'Paid'
+    assert order.mp_payment_id == '9001'
+
+
+def test_reconcile_does_not_move_order_backwards(make_order):
+    order_id = make_order(status='Pending Payment').id
+
+    def process_order_meanwhile():
+        # Webhook + processamento concluídos enquanto a busca estava em andamento
+        with db.engine.begin() as connection:
+            connection.execute(
+                text('UPDATE "order" SET status = \'Processing\', order_id_barato_sociais = 777 WHERE id = :id'),
+                {'id': order_id}
+            )
+
+    api = FakeMercadoPagoAPI([payment(order_id)], during_search=process_order_meanwhile)
+    result = reconcile_payments(api, 72)
+    db.session.commit()
+
+    assert result['updated'] == 0
+    db.session.expire_all()
+    assert db.session.get(Order, order_id).status == 'Processing'
+
+
+def test_reconcile_keeps_updated_at_when_nothing_changes(make_order):
+    order_id = make_order(status='Pending Payment', updated_at=days_ago(1)).id
+    updated_at = db.session.get(Order, order_id).updated_at
+
+    api = FakeMercadoPagoAPI([payment(order_id, status='pending', payment_id=None)])
+    result = reconcile_payments(api, 72)
+    db.session.commit()
+
+    assert result['updated'] == 0
+    db.session.expire_all()
+    assert db.session.get(Order, order_id).updated_at == updated_at
+
+
+def test_webhook_payment_does_not_reopen_submitted_order(make_order):
+    order_id = make_order(status='Submitting').id
+
+    assert apply_payment_to_order(order_id, payment(order_id, status='pending'))['status'] == 'Submitting'
+    db.session.commit()
+
+
+def test_refund_is_applied_to_paid_order(make_order):
+    order_id = make_order(status='Paid').id
+
+    assert apply_payment_to_order(order_id, payment(order_id, status='refunded'))['status'] == 'Refunded'
+    db.session.commit()
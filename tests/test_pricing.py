@@ -0,0 +1,11 @@
+import pytest
+
+from src.services.pricing import validate_rule
+
+
+def test_rate_band_requires_min_below_max():
+    rule = validate_rule({'scope': 'rate_band', 'profit_margin': 0.3, 'min_rate': 1, 'max_rate': 5})
+    assert (rule.min_rate, rule.max_rate) == (1.0, 5.0)
+
+    with pytest.raises(ValueError, match='min_rate must be less than max_rate'):
+        validate_rule({'scope': 'rate_band', 'profit_margin': 0.3, 'min_rate': 5, 'max_rate': 1})
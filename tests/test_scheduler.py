@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+from src.models.user import db, JobLease
+from src.services.scheduler import release_lease, try_acquire_lease
+
+
+def lease(name):
+    db.session.expire_all()
+    return db.session.get(JobLease, name)
+
+
+def test_first_process_acquires_and_others_are_refused(app):
+    assert try_acquire_lease('sync_orders', 'worker-a', 60)
+    assert not try_acquire_lease('sync_orders', 'worker-b', 60)
+    assert lease('sync_orders').owner == 'worker-a'
+
+
+def test_owner_renews_its_lease(app):
+    assert try_acquire_lease('sync_orders', 'worker-a', 60)
+    first_expiry = lease('sync_orders').expires_at
+
+    assert try_acquire_lease('sync_orders', 'worker-a', 600)
+    assert lease('sync_orders').expires_at > first_expiry
+    assert lease('sync_orders').owner == 'worker-a'
+
+
+def test_expired_lease_is_taken_over(app):
+    assert try_acquire_lease('sync_orders', 'worker-a', 60)
+    lease('sync_orders').expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+    assert try_acquire_lease('sync_orders', 'worker-b', 60)
+    assert lease('sync_orders').owner == 'worker-b'
+    # O antigo líder perde o lease na próxima renovação
+    assert not try_acquire_lease('sync_orders', 'worker-a', 60)
+
+
+def test_released_lease_can_be_taken_immediately(app):
+    assert try_acquire_lease('sync_orders', 'worker-a', 60)
+
+    # Apenas o dono libera o lease
+    release_lease('sync_orders', 'worker-b')
+    assert not try_acquire_lease('sync_orders', 'worker-b', 60)
+
+    release_lease('sync_orders', 'worker-a')
+    assert try_acquire_lease('sync_orders', 'worker-b', 60)
+
+
+def test_leases_are_independent_per_job(app):
+    assert try_acquire_lease('sync_orders', 'worker-a', 60)
+    assert try_acquire_lease('archive_orders', 'worker-b', 60)
@@ -0,0 +1,40 @@
+from src.models.user import db, PricingRule, Service
+from src.routes import services as services_routes
+from tests.conftest import login
+
+
+class FakeCatalogAPI:
+    def __init__(self, services):
+        self.services = services
+
+    def get_services(self):
+        return self.services
+
+
+def catalog_entry(category, rate='1.0'):
+    return {
+        'service': 1001,
+        'name': 'Seguidores',
+        'type': 'Default',
+        'category': category,
+        'rate': rate,
+        'min': 10,
+        'max': 1000
+    }
+
+
+def test_sync_reprices_services_that_change_category(client, service, monkeypatch):
+    service_id = service.id
+    db.session.add(PricingRule(scope='category', value='TikTok', profit_margin=0.9))
+    db.session.commit()
+    monkeypatch.setattr(services_routes, 'get_barato_sociais_api', lambda: FakeCatalogAPI([catalog_entry('TikTok')]))
+    login(client)
+
+    response = client.post('/api/services/sync')
+
+    assert response.status_code == 200
+    assert response.get_json()['updated'] == 1
+    db.session.expire_all()
+    updated = db.session.get(Service, service_id)
+    assert updated.category == 'TikTok'
+    assert updated.profit_margin == 0.9
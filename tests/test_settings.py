@@ -0,0 +1,36 @@
+import pytest
+
+from src.models.user import db
+from src.services.catalog import bump_catalog_version
+from tests.conftest import login
+
+
+def test_sensitive_settings_are_masked(client):
+    login(client)
+    client.put('/api/settings/mp_webhook_secret', json={'value': 'segredo'})
+
+    settings = client.get('/api/settings').get_json()['settings']
+
+    assert settings['mp_webhook_secret'] == '***'
+    assert settings['mp_client_secret'] == '***'
+    assert settings['barato_sociais_api_key'] == '***'
+    assert settings['site_name'] == 'INFLUENCIANDO'
+
+    response = client.get('/api/settings/mp_webhook_secret')
+    assert response.get_json()['value'] == '***'
+
+
+@pytest.mark.parametrize('key', ['settings_version', 'catalog_version'])
+def test_internal_versions_are_hidden_and_read_only(client, key):
+    login(client)
+    # Cria as duas versões internas
+    client.put('/api/settings/site_name', json={'value': 'Outro nome'})
+    bump_catalog_version()
+    db.session.commit()
+
+    assert key not in client.get('/api/settings').get_json()['settings']
+    assert client.get(f'/api/settings/{key}').status_code == 404
+
+    assert client.post('/api/settings', json={key: 'x'}).status_code == 400
+    assert client.put(f'/api/settings/{key}', json={'value': 'x'}).status_code == 400
+    assert client.delete(f'/api/settings/{key}').status_code == 400
@@ -0,0 +1,23 @@
+from src.models.user import db, UserStats
+
+
+def counters(user_id):
+    return {
+        stats.status: (stats.order_count, stats.total_amount)
+        for stats in UserStats.query.filter_by(user_id=user_id) if stats.order_count
+    }
+
+
+def test_status_change_on_expired_order_moves_counters(make_order):
+    order = make_order(status='Pending Payment')
+    user_id = order.user_id
+
+    # Pedido expirado (como após um commit): o status anterior não está carregado
+    db.session.expire(order)
+    order.status = 'Paid'
+    db.session.commit()
+    assert counters(user_id) == {'Paid': (1, 150.0)}
+
+    order.status = 'Completed'
+    db.session.commit()
+    assert counters(user_id) == {'Completed': (1, 150.0)}
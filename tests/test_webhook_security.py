@@ -0,0 +1,97 @@
+import hashlib
+import hmac
+import time
+
+import pytest
+
+from src.models.user import db, Order
+from src.routes import webhooks as webhook_routes
+from src.services.webhook_security import ReplayCache, build_manifest, verify_signature
+from tests.conftest import login
+
+SECRET = 'segredo-do-webhook'
+
+
+def sign(data_id, request_id, ts, secret=SECRET):
+    digest = hmac.new(
+        secret.encode('utf-8'),
+        build_manifest(data_id, request_id, ts).encode('utf-8'),
+        hashlib.sha256
+    ).hexdigest()
+    return f'ts={ts},v1={digest}'
+
+
+def test_valid_signature_is_accepted():
+    ts = int(time.time())
+    assert verify_signature(SECRET, sign('123', 'req-1', ts), 'req-1', '123') is None
+
+
+def test_tampered_signature_is_rejected():
+    ts = int(time.time())
+    header = sign('123', 'req-1', ts)
+    assert verify_signature(SECRET, header, 'req-1', '456') == 'Invalid signature'
+    assert verify_signature('outro-segredo', header, 'req-1', '123') == 'Invalid signature'
+    assert verify_signature(SECRET, 'v1=abc', 'req-1', '123') == 'Missing or malformed signature'
+
+
+def test_expired_signature_is_rejected():
+    ts = int(time.time()) - 3600
+    assert verify_signature(SECRET, sign('123', 'req-1', ts), 'req-1', '123') == \
+        'Signature timestamp outside the allowed window'
+
+
+class FakeMercadoPagoAPI:
+    def __init__(self, order_id):
+        self.order_id = order_id
+        self.calls = 0
+
+    def get_payment_info(self, payment_id):
+        self.calls += 1
+        return {'id': payment_id, 'status': 'approved', 'external_reference': str(self.order_id)}
+
+
+@pytest.fixture
+def webhook(client, make_order, monkeypatch):
+    order_id = make_order(status='Pending Payment').id
+    api = FakeMercadoPagoAPI(order_id)
+    monkeypatch.setattr(webhook_routes, 'get_mercado_pago_api', lambda: api)
+    login(client)
+    client.put('/api/settings/mp_webhook_secret', json={'value': SECRET})
+    client.post('/api/auth/logout')
+
+    def post(request_id='req-1', ts=None, secret=SECRET):
+        ts = int(time.time()) if ts is None else ts
+        return client.post(
+            '/api/webhooks/mercadopago',
+            json={'type': 'payment', 'data': {'id': '9001'}},
+            headers={'x-signature': sign('9001', request_id, ts, secret), 'x-request-id': request_id}
+        )
+    post.api = api
+    post.order_id = order_id
+    return post
+
+
+def test_webhook_applies_signed_notification(webhook):
+    response = webhook()
+
+    assert response.status_code == 200
+    assert response.get_json()['new_status'] == 'Paid'
+    assert db.session.get(Order, webhook.order_id).status == 'Paid'
+
+
+def test_webhook_rejects_bad_signatures(webhook):
+    assert webhook(secret='outro-segredo').status_code == 401
+    assert webhook(ts=int(time.time()) - 3600).status_code == 401
+    assert webhook.api.calls == 0
+
+
+def test_webhook_replay_is_ignored_across_processes(webhook):
+    assert webhook().status_code == 200
+
+    replay = webhook()
+    assert replay.get_json()['message'] == 'Duplicate notification ignored'
+    assert webhook.api.calls == 1
+
+    # Outro worker (outra instância do cache) também reconhece o id
+    assert ReplayCache().seen('req-1')
+    assert not ReplayCache(ttl=-1).seen('req-1')
@@ -0,0 +1,111 @@
+import os
+from concurrent.futures import Future, TimeoutError
+
+import pytest
+from sqlalchemy import event
+
+from src.models.user import db, Setting
+from src.services.write_queue import WriteQueue
+
+
+def add_setting(key):
+    db.session.add(Setting(key=key, value='1'))
+    db.session.flush()
+    return key
+
+
+def fail_setting(key):
+    add_setting(key)
+    raise ValueError('falha proposital')
+
+
+@pytest.fixture
+def transactions(app):
+    """Conta os commits e as transações encerradas fora de um commit (ex.: RELEASE)"""
+    counts = {'commits': 0, 'implicit': 0}
+
+    def on_commit(conn):
+        counts['commits'] += 1
+
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('RELEASE') and not conn.connection.dbapi_connection.in_transaction:
+            counts['implicit'] += 1
+
+    event.listen(db.engine, 'commit', on_commit)
+    event.listen(db.engine, 'after_cursor_execute', after_execute)
+    yield counts
+    event.remove(db.engine, 'commit', on_commit)
+    event.remove(db.engine, 'after_cursor_execute', after_execute)
+
+
+def queued(fn, *args):
+    return fn, args, {}, Future()
+
+
+def test_group_is_committed_in_a_single_transaction(app, transactions):
+    group = [
+        queued(add_setting, 'grupo_1'),
+        queued(fail_setting, 'grupo_2'),
+        queued(add_setting, 'grupo_3')
+    ]
+
+    WriteQueue()._flush_group(group)
+    db.session.remove()
+
+    assert transactions == {'commits': 1, 'implicit': 0}
+    assert group[0][3].result() == 'grupo_1'
+    assert group[2][3].result() == 'grupo_3'
+    with pytest.raises(ValueError):
+        group[1][3].result()
+
+    keys = {setting.key for setting in Setting.query.filter(Setting.key.like('grupo_%'))}
+    assert keys == {'grupo_1', 'grupo_3'}
+
+
+def test_timed_out_write_is_cancelled(app):
+    write_queue = WriteQueue()
+    write_queue.init_app(app)
+    write_queue.enabled = True
+    write_queue.timeout = 0.01
+    # Sem a thread da fila: o item fica parado até o timeout
+    write_queue._pid = os.getpid()
+
+    with pytest.raises(TimeoutError):
+        write_queue.submit(add_setting, 'atrasada')
+
+    group = [write_queue._queue.get_nowait()]
+    assert group[0][3].cancelled()
+
+    write_queue._flush_group(group)
+    db.session.remove()
+    assert Setting.query.filter_by(key='atrasada').first() is None
+
+
+def test_flusher_thread_survives_unexpected_errors(app, monkeypatch):
+    write_queue = WriteQueue()
+    write_queue.init_app(app)
+    write_queue.enabled = True
+    write_queue.timeout = 5
+
+    flush_group = write_queue._flush_group
+    failures = [RuntimeError('falha inesperada')]
+
+    def flaky_flush_group(group):
+        if failures:
+            raise failures.pop()
+        flush_group(group)
+
+    monkeypatch.setattr(write_queue, '_flush_group', flaky_flush_group)
+
+    with pytest.raises(RuntimeError):
+        write_queue.submit(add_setting, 'primeira')
+    assert write_queue.submit(add_setting, 'segunda') == 'segunda'
+
+
+def test_write_queue_timeout_is_configurable(monkeypatch):
+    from src.main import create_app
+
+    monkeypatch.setenv('WRITE_QUEUE_TIMEOUT', '2.5')
+    write_queue = WriteQueue()
+    write_queue.init_app(create_app())
+    assert write_queue.timeout == 2.5